@@ -1,25 +1,11 @@
 
-import { getDatabase } from "../lib/notion";
+import { getArticles, type Article } from "../lib/articles";
 import { ArticleCard } from "@/components/ArticleCard";
 
-interface RichTextItem {
-  plain_text: string;
-}
-
-interface NotionPost {
-  id: string;
-  properties: {
-    Title?: { title: Array<RichTextItem> };
-    Published?: { date: { start: string } };
-    URL?: { url: string };
-    Summary?: { rich_text: Array<RichTextItem> };
-  };
-}
 export default async function Home() {
-  let posts: NotionPost[] = [];
+  let posts: Article[] = [];
   try {
-    const dbPosts = await getDatabase();
-    posts = dbPosts as unknown as NotionPost[];
+    posts = await getArticles();
   } catch (error) {
     console.error("Failed to fetch posts:", error);
     // Continue with empty posts to avoid build failure
@@ -44,7 +30,7 @@ export default async function Home() {
         ) : (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6 md:gap-8">
             {posts.map((post) => {
-              const dateStr = post.properties.Published?.date?.start;
+              const dateStr = post.published;
               const date = dateStr
                 ? new Date(dateStr).toLocaleDateString("ja-JP", {
                   year: "numeric",
@@ -53,13 +39,9 @@ export default async function Home() {
                 })
                 : "Unknown Date";
 
-              const title =
-                post.properties.Title?.title?.[0]?.plain_text || "No Title";
-              const originalUrl = post.properties.URL?.url || "#";
-              const summary =
-                post.properties.Summary?.rich_text
-                  ?.map((t: RichTextItem) => t.plain_text)
-                  .join("") || "";
+              const title = post.title || "No Title";
+              const originalUrl = post.url || "#";
+              const summary = post.summary || "";
 
               // If no URL is present, we skip rendering or render differently?
               // The feedback suggests better fallback. Let's return null (hide) for now as "Curated Knowledge" implies we should have a link.
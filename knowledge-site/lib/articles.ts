@@ -0,0 +1,74 @@
+import { promises as fs } from "fs";
+import path from "path";
+import { getDatabase } from "./notion";
+
+export interface Article {
+  id: string;
+  title: string;
+  url: string | null;
+  published: string | null;
+  summary: string | null;
+}
+
+interface RichTextItem {
+  plain_text: string;
+}
+
+interface NotionPost {
+  id: string;
+  properties: {
+    Title?: { title: Array<RichTextItem> };
+    Published?: { date: { start: string } | null };
+    URL?: { url: string | null };
+    Summary?: { rich_text: Array<RichTextItem> };
+  };
+}
+
+// Must match SNAPSHOT_VERSION in knowledge_ingest/snapshot.py.
+const SNAPSHOT_VERSION = 1;
+
+export const getSnapshotPath = () =>
+  process.env.KNOWLEDGE_SNAPSHOT_PATH || path.join(process.cwd(), "data", "articles.ndjson");
+
+// Articles from the snapshot the ingest pipeline exports (newest first), or
+// null when there is no usable snapshot.
+export const readSnapshot = async (): Promise<Article[] | null> => {
+  const snapshotPath = getSnapshotPath();
+  let raw: string;
+  try {
+    raw = await fs.readFile(snapshotPath, "utf-8");
+  } catch {
+    return null;
+  }
+
+  const [headerLine, ...lines] = raw.split("\n").filter((line) => line.trim());
+  try {
+    const header = JSON.parse(headerLine ?? "{}");
+    if (header.version !== SNAPSHOT_VERSION) {
+      console.warn("Unsupported snapshot version, falling back to Notion", { snapshotPath, version: header.version });
+      return null;
+    }
+    return lines.map((line) => JSON.parse(line) as Article);
+  } catch (error) {
+    console.error("Failed to parse snapshot, falling back to Notion", { snapshotPath, error });
+    return null;
+  }
+};
+
+const fromNotionPost = (post: NotionPost): Article => ({
+  id: post.id,
+  title: post.properties.Title?.title?.[0]?.plain_text || "",
+  url: post.properties.URL?.url || null,
+  published: post.properties.Published?.date?.start || null,
+  summary: post.properties.Summary?.rich_text?.map((t) => t.plain_text).join("") || null,
+});
+
+// The snapshot when there is one; otherwise every page of the Notion database.
+export const getArticles = async (): Promise<Article[]> => {
+  const snapshot = await readSnapshot();
+  if (snapshot) {
+    return snapshot;
+  }
+  const posts = await getDatabase();
+  return (posts as unknown as NotionPost[]).map(fromNotionPost);
+};
@@ -0,0 +1,17 @@
+"""RSS -> summarize -> Notion ingestion pipeline.
+
+Importing the package has no side effects and loads nothing heavy;
+`IngestRun` (and with it httpx and the pipeline modules) is imported on
+first access. The Notion / OpenAI SDKs load only when a run needs them.
+"""
+from .config import Config, load_dotenv
+
+__all__ = ["Config", "IngestRun", "load_dotenv"]
+
+
+def __getattr__(name):
+    if name == "IngestRun":
+        from .app import IngestRun
+
+        return IngestRun
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
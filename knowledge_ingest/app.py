@@ -0,0 +1,810 @@
+import asyncio
+import calendar
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+
+from .archive import iter_archive
+from .batch_summarize import BatchSummarizer
+from .config import Config
+from .content_budget import clean_text, count_tokens, fit, plan
+from .extract import ProcessExtractor, extract_text
+from .extractive import compress, local_summary
+from .feed_fetch import entry_id, entry_timestamp, fetch_feeds, select_new_entries
+from .feed_schedule import FeedScheduler
+from .http_cache import HttpCache
+from .http_pool import HttpPool
+from .metrics import REPORT_VERSION, Metrics, compare_reports, load_report, write_atomic
+from .near_dup import NearDuplicateIndex, simhash
+from .notion_index import (
+    FINGERPRINT_PROPERTY, NOTION_BASE_URL, NotionUrlIndex, fingerprint_text, notion_page_by_url,
+    notion_page_exists_by_url,
+)
+from .pipeline import Article, Stage, run_stages
+from .ratelimit import RateLimitedService, RetryBudget, TokenBucket
+from .run_journal import BATCHED, EXTRACTED, FETCHED, SUMMARIZED, WRITING, WRITTEN, RunJournal, journal_key
+from .search_index import SearchIndex
+from .sharding import shard_of
+from .snapshot import KnowledgeSnapshot
+from .state_store import StateStore, content_hash
+from .summary_cache import SummaryCache, summary_cache_key
+from .urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Bump when build_prompt changes so cached summaries from the old prompt are not reused.
+PROMPT_VERSION = "2"
+
+
+def build_prompt(title: str, article_text: str) -> str:
+    # Updated Prompt Logic: Handle empty text
+    content_part = f"本文:\n{article_text}" if article_text and len(article_text) > 50 else "本文: (内容が取得できませんでした。タイトルから内容を推測してください)"
+
+    return f"""
+    以下の記事を日本語で3行要約し、
+    重要ポイントを箇条書きで出力してください。
+    もし本文がない場合は、タイトルから内容を推測して要約を作成してください。
+    絶対に「情報不足で要約できない」とは答えず、推測できる範囲で出力すること。
+
+    タイトル: {title}
+
+    {content_part}
+    """
+
+
+def build_chunk_prompt(title: str, chunk: str, index: int, total: int) -> str:
+    # Map step for long articles: notes on one part, merged by build_reduce_prompt.
+    return f"""
+    以下は長い記事の一部（{index}/{total}）です。
+    この部分に書かれている重要な事実・主張・数値を日本語の箇条書きで簡潔に抜き出してください。
+    前置きや他の部分への言及は不要です。
+
+    タイトル: {title}
+
+    本文（{index}/{total}）:
+    {chunk}
+    """
+
+
+def build_reduce_prompt(title: str, notes: list[str]) -> str:
+    parts = "\n\n".join(f"[{i}/{len(notes)}]\n{note}" for i, note in enumerate(notes, 1))
+    return f"""
+    以下は長い記事を前から順に分割し、各部分の要点を抜き出したメモです。
+    記事全体を日本語で3行要約し、
+    重要ポイントを箇条書きで出力してください。
+    記事の後半の内容も落とさないこと。
+
+    タイトル: {title}
+
+    メモ:
+    {parts}
+    """
+
+
+def published_date(e) -> str | None:
+    # Notion wants ISO8601. feedparser's *_parsed are UTC; written in the same
+    # form as snapshot.normalize_published so local and synced rows compare equal.
+    for key in ("published_parsed", "updated_parsed"):
+        if key in e and e[key]:
+            try:
+                return datetime.fromtimestamp(calendar.timegm(e[key]), timezone.utc).isoformat(timespec="seconds")
+            except Exception:
+                return None
+    return None
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def load_feeds(path: str) -> list[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load feeds.json: {e}")
+        return []
+
+
+class IngestRun:
+    """One pass of feeds -> fetch -> extract -> summarize -> Notion.
+
+    Nothing happens on construction; `run()` opens the state store, fetches
+    the feeds, runs the pipeline and returns the run report. The Notion and
+    OpenAI SDKs are imported the first time a stage needs them, so a
+    `test_mode` run never loads them. `notion` / `openai` (SDK clients),
+    `http_pool` (http_pool.HttpPool) and `state` (state_store.StateStore) can
+    be passed in instead of being built from `config`.
+    """
+
+    def __init__(self, config: Config, notion=None, openai=None, http_pool=None, state=None):
+        self.config = config
+        self._notion = notion
+        self._openai = openai
+        self.http_pool = http_pool
+        self.state = state
+        # Only what run() opened itself is closed at the end.
+        self._owned = []
+        self.metrics = Metrics()
+        retry_budget = RetryBudget(config.retry_budget)
+        # Shards run side by side against the same Notion integration / OpenAI account.
+        share = max(1, config.shard_count)
+        self.notion_api = RateLimitedService("notion", TokenBucket(config.notion_rps / share), retry_budget)
+        self.openai_api = RateLimitedService("openai", TokenBucket(config.openai_rps / share), retry_budget)
+        self.url_index = None
+        self.snapshot = None
+        self.search = None
+        self.semantic = None
+        self.near_dups = None
+        self.summary_cache = None
+        self.batch = None
+        self.journal = None
+        self.extractor = None
+        self.scheduler = None
+        self.page_cache = None
+        self.total_entries = 0
+        self._processed = 0
+        # URLs / content hashes claimed by an entry that is still in flight, so two
+        # copies of the same article in one run are not both summarized and written.
+        self._in_flight = set()
+        self._claims_lock = threading.Lock()
+        # The first summarize / write workers race to build the SDK clients.
+        self._clients_lock = threading.Lock()
+
+    def check(self) -> None:
+        config = self.config
+        if not config.test_mode and not config.notion_token:
+            raise RuntimeError("NOTION_TOKEN is not set. Put it in .env or your environment.")
+        if not config.test_mode and not config.notion_database_id:
+            raise RuntimeError("NOTION_DATABASE_ID is not set. Put it in .env or your environment.")
+        if not config.test_mode and not config.openai_key:
+            raise RuntimeError("OPENAI_API_KEY is not set. Put it in .env or your environment.")
+        if config.notion_database_id and not _is_uuid(config.notion_database_id):
+            logger.warning(f"NOTION_DATABASE_ID {config.notion_database_id} doesn't look like a UUID. Using as-is.")
+
+    @property
+    def notion(self):
+        with self._clients_lock:
+            if self._notion is None:
+                from notion_client import Client
+
+                self._notion = Client(auth=self.config.notion_token, base_url=NOTION_BASE_URL, client=self.http_pool.client())
+            return self._notion
+
+    @property
+    def openai(self):
+        with self._clients_lock:
+            if self._openai is None:
+                from openai import OpenAI
+
+                # Retries are handled by RateLimitedService, not by the SDK. The pooled
+                # client would otherwise impose HTTP_TIMEOUT on every completion.
+                self._openai = OpenAI(
+                    api_key=self.config.openai_key, max_retries=0, timeout=self.config.openai_timeout,
+                    http_client=self.http_pool.client(),
+                )
+            return self._openai
+
+    def claim(self, key: str) -> bool:
+        with self._claims_lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def release(self, *keys: str | None) -> None:
+        # Once the URL index / state store knows an entry, its claims are no longer
+        # needed; letting them go keeps a long backfill from growing this set.
+        with self._claims_lock:
+            for key in keys:
+                self._in_flight.discard(key)
+
+    def record(self, article: Article, stage: str, **data) -> None:
+        if self.journal is not None:
+            self.journal.record(article.link, stage, **data)
+
+    def fetch_stage(self, article: Article) -> Article | None:
+        e = article.entry
+        metrics = self.metrics
+        with self._claims_lock:
+            self._processed += 1
+            processed = self._processed
+        logger.info(f"[{processed}/{self.total_entries}] {article.title}")
+        if self.url_index.exists(article.link) or not self.claim(normalize_url(article.link)):
+            logger.info(f"  -> skip (already exists): {article.title}")
+            metrics.inc("entries_skipped", reason="exists")
+            if article.resumed:
+                self.record(article, WRITTEN)
+            return None
+        if self.batch is not None and self.batch.is_pending(article.link):
+            logger.info(f"  -> skip (waiting for batch): {article.title}")
+            metrics.inc("entries_skipped", reason="batch_pending")
+            if article.resumed:
+                self.record(article, BATCHED)
+            return None
+        if article.resumed:
+            logger.info(f"  -> resuming after '{article.resumed}': {article.title}")
+            return article
+
+        # Prefer RSS-provided content/summary to avoid heavy HTML parsing libs.
+        if "content" in e and e.content:
+            article.raw_html = e.content[0].value
+            metrics.inc("article_sources", source="feed_content")
+        elif "summary" in e and e.summary:
+            article.raw_html = e.summary
+            metrics.inc("article_sources", source="feed_summary")
+        else:
+            try:
+                with metrics.timer("article_fetch_seconds"):
+                    if self.page_cache is not None:
+                        resp = self.page_cache.get(self.http_pool.http, article.link, timeout=15)
+                    else:
+                        resp = self.http_pool.http.get(article.link, timeout=15)
+                resp.raise_for_status()
+                article.raw_html = resp.text
+                cached = resp.extensions.get("cache")
+                if cached:
+                    metrics.inc("page_cache", result=cached)
+                if cached not in ("hit", "revalidated"):
+                    metrics.inc("downloaded_bytes", len(resp.content), source="article")
+                metrics.inc("article_sources", source="page")
+            except (httpx.HTTPError, httpx.InvalidURL):
+                article.raw_html = ""
+                metrics.inc("article_sources", source="none")
+
+        article.published = published_date(e)
+        self.record(article, FETCHED)
+        return article
+
+    def extract_stage(self, article: Article) -> Article | None:
+        if article.resumed:
+            return article
+        self.metrics.inc("extract_input_chars", len(article.raw_html))
+        extract = self.extractor.extract if self.extractor is not None else extract_text
+        article.text = extract(article.raw_html, self.config.article_text_limit)
+        article.raw_html = ""
+
+        # Same text already ingested under another URL (syndicated copies etc.)
+        article.digest = content_hash(article.text) if len(article.text) > 50 else None
+        if article.digest and (self.state.has_content_hash(article.digest) or not self.claim(article.digest)):
+            logger.info(f"  -> skip (same content already exists): {article.title}")
+            self.metrics.inc("entries_skipped", reason="same_content")
+            self.url_index.add(article.link)
+            self.release(normalize_url(article.link))
+            return None
+
+        # Reposts, AMP copies and lightly edited cross-posts.
+        if self.near_dups is not None and len(article.text) >= self.config.near_dup_min_chars:
+            article.simhash = simhash(article.text)
+            match = self.near_dups.reserve(normalize_url(article.link), article.simhash)
+            if match:
+                logger.info(f"  -> skip (near-duplicate of {match[0]}, {match[1]} bits apart): {article.title}")
+                self.metrics.inc("entries_skipped", reason="near_duplicate")
+                self.url_index.add(article.link)
+                self.release(normalize_url(article.link), article.digest)
+                return None
+        self.record(
+            article, EXTRACTED,
+            title=article.title, link=article.link, feed_url=article.feed_url, published=article.published,
+            text=article.text, digest=article.digest, simhash=article.simhash,
+        )
+        return article
+
+    def presummarize_stage(self, article: Article) -> Article | None:
+        if article.summary is not None:
+            return article
+        config = self.config
+        text = clean_text(article.text)
+        tokens = count_tokens(text)
+        policy = "all" if config.test_mode else config.local_summary
+        if policy == "all" or (policy == "short" and tokens < config.local_summary_min_tokens):
+            article.summary = local_summary(article.title, text)
+            self.metrics.inc("summary_requests", kind="local")
+            logger.info(f"  -> local summary ({tokens} tokens of text): {article.title}")
+            self.record(article, SUMMARIZED, summary=article.summary)
+            return article
+
+        budget = config.summary_input_tokens
+        if budget < tokens <= budget * config.compress_factor:
+            article.text = compress(text, budget)
+            self.metrics.inc("article_tokens", tokens - count_tokens(article.text), kind="compressed_away")
+        return article
+
+    def summarize_stage(self, article: Article) -> Article | None:
+        if article.summary is not None:
+            return article
+        model = self.config.summary_model
+        cache_key = summary_cache_key(article.text, PROMPT_VERSION, model, title=article.title)
+        cached = self.summary_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"  -> summary cache hit: {article.title}")
+            article.summary = cached
+            self.record(article, SUMMARIZED, summary=article.summary)
+            return article
+
+        config = self.config
+        parts = plan(article.text, config.summary_input_tokens, config.summary_chunk_tokens, config.summary_max_chunks)
+        self.metrics.inc("article_tokens", count_tokens(article.text), kind="extracted")
+
+        if self.batch is not None:
+            # A batch request cannot feed a second (reduce) request, so long
+            # articles are cut to the single-prompt budget instead.
+            text = parts[0] if len(parts) == 1 else fit("\n".join(parts), config.summary_input_tokens)
+            self.metrics.inc("article_tokens", count_tokens(text), kind="prompt")
+            self.batch.add(article, build_prompt(article.title, text))
+            self.record(article, BATCHED)
+            logger.info(f"  -> queued for batch: {article.title}")
+            return None
+
+        if len(parts) == 1:
+            self.metrics.inc("article_tokens", count_tokens(parts[0]), kind="prompt")
+            article.summary = self._complete(build_prompt(article.title, parts[0]), kind="single")
+        else:
+            article.summary = self._map_reduce(article, parts)
+        self.summary_cache.put(cache_key, article.summary)
+        self.record(article, SUMMARIZED, summary=article.summary)
+        return article
+
+    def _complete(self, prompt: str, kind: str) -> str:
+        with self.metrics.timer("openai_request_seconds"):
+            res = self.openai_api.call(
+                self.openai.chat.completions.create,
+                model=self.config.summary_model,
+                messages=[{"role":"user","content":prompt}]
+            )
+        self.metrics.inc("summary_requests", kind=kind)
+        if res.usage is not None:
+            self.metrics.inc("openai_tokens", res.usage.prompt_tokens, direction="in")
+            self.metrics.inc("openai_tokens", res.usage.completion_tokens, direction="out")
+        return res.choices[0].message.content
+
+    def _map_reduce(self, article: Article, chunks: list[str]) -> str:
+        # Chunks are summarized in parallel (paced by the OpenAI token bucket),
+        # then the notes are merged in order by one more call.
+        logger.info(f"  -> long article, summarizing {len(chunks)} chunks: {article.title}")
+        for chunk in chunks:
+            self.metrics.inc("article_tokens", count_tokens(chunk), kind="prompt")
+        prompts = [build_chunk_prompt(article.title, chunk, i, len(chunks)) for i, chunk in enumerate(chunks, 1)]
+        workers = max(1, min(len(prompts), self.config.summary_chunk_concurrency))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary-chunk") as pool:
+            notes = list(pool.map(lambda prompt: self._complete(prompt, kind="map"), prompts))
+        return self._complete(build_reduce_prompt(article.title, notes), kind="reduce")
+
+    def write_stage(self, article: Article) -> Article | None:
+        config = self.config
+        if config.test_mode:
+            logger.info(f"  -> Notion write skipped (TEST_MODE): {article.title}")
+            self.url_index.add(article.link)
+            self.release(normalize_url(article.link), article.digest)
+            return article  # count as would-add for parity with non-test runs
+
+        properties = {
+            "Title":{"title":[{"text":{"content":article.title}}]},
+            "Summary":{"rich_text":[{"text":{"content":article.summary}}]},
+            "URL":{"url":article.link}
+        }
+
+        if article.published:
+            properties["Published"] = {"date": {"start": article.published}}
+        fingerprint = fingerprint_text(article.digest, article.simhash) if self.url_index.fingerprints else None
+        if fingerprint:
+            properties[FINGERPRINT_PROPERTY] = {"rich_text": [{"text": {"content": fingerprint}}]}
+
+        # A crash between pages.create and the `written` record leaves `writing`
+        # behind; ask Notion directly (the index may lag) before writing again.
+        if article.resumed == WRITING and notion_page_exists_by_url(
+            config.notion_token, config.database_id, article.link, service=self.notion_api, http=self.http_pool.http
+        ):
+            logger.info(f"  -> skip (written by the interrupted run): {article.title}")
+            self.url_index.add(article.link)
+            self.record(article, WRITTEN)
+            return None
+
+        # Other shards write at the same time; their pages only reach this shard's
+        # store with the next sync, so ask Notion for the same content once more.
+        if config.shard_count > 1 and self.url_index.fingerprint_exists(article.digest):
+            logger.info(f"  -> skip (same content written by another shard): {article.title}")
+            self.metrics.inc("entries_skipped", reason="same_content")
+            self.url_index.add(article.link)
+            self.release(normalize_url(article.link), article.digest)
+            self.record(article, WRITTEN)
+            return None
+
+        self.record(article, WRITING)
+        with self.metrics.timer("notion_write_seconds"):
+            # Creating a page is not idempotent: a failure after the request was sent
+            # is only retried once Notion confirms the page is not there.
+            page = self.notion_api.call_once(
+              self.notion.pages.create,
+              parent={"database_id": config.database_id},
+              properties=properties,
+              find_existing=lambda: notion_page_by_url(
+                  config.notion_token, config.database_id, article.link,
+                  service=self.notion_api, http=self.http_pool.http,
+              ),
+            )
+        article.page_id = page.get("id")
+        self.record(article, WRITTEN, page_id=article.page_id)
+        self.url_index.add(article.link, page_id=article.page_id, content_hash=article.digest)
+        self.release(normalize_url(article.link), article.digest)
+        if self.semantic is not None:
+            self._embed(article)
+        if self.search is not None:
+            self.search.add(article.page_id, article.link, article.title, article.published, article.summary, article.text)
+        if self.snapshot is not None:
+            self.snapshot.upsert({
+                "id": article.page_id, "title": article.title, "url": article.link,
+                "published": article.published, "summary": article.summary,
+            })
+        if self.near_dups is not None and article.simhash is not None:
+            self.near_dups.add(normalize_url(article.link), article.simhash)
+        if self.batch is not None:
+            self.batch.mark_written(article.link)
+        logger.info(f"  -> done: {article.title}")
+        return article
+
+    def on_error(self, article: Article, stage: str, exc: Exception) -> None:
+        logger.error(f"Failed to process entry '{article.title}' (URL: {normalize_url(article.link)}) at {stage}: {exc}")
+        # Nothing was written, so a later entry with the same text may still be.
+        self.release(normalize_url(article.link), article.digest)
+
+    def _open(self) -> None:
+        config = self.config
+        if self.http_pool is None:
+            # One keep-alive pool (HTTP_* settings) for feeds, articles, Notion and OpenAI.
+            # A pool of its own, not http_pool.shared_pool(): closing that one at the
+            # end would break every later run and caller in the process.
+            self.http_pool = HttpPool.from_env()
+            self._owned.append(self.http_pool)
+        if self.state is None:
+            self.state = StateStore(config.state_db)
+            self._owned.append(self.state)
+        state = self.state
+        if config.http_cache_path != "off" and not config.test_mode:
+            self.page_cache = HttpCache(
+                config.http_cache_path, max_bytes=int(config.http_cache_max_mb * 1024 * 1024),
+                min_ttl=config.http_cache_min_ttl,
+            )
+            self._owned.append(self.page_cache)
+        if config.search_db and not config.test_mode:
+            self.search = SearchIndex(config.search_db)
+            self._owned.append(self.search)
+        if config.embedding_model != "off" and not config.test_mode:
+            self.semantic = self._semantic_index()
+        if config.snapshot_path:
+            self.snapshot = KnowledgeSnapshot(state, config.snapshot_path)
+        if config.feed_schedule and not config.backfill:
+            self.scheduler = FeedScheduler(state, config.feed_min_interval, config.feed_max_interval)
+        if config.extract_processes > 0:
+            self.extractor = ProcessExtractor(config.extract_processes, chunk_size=config.extract_chunk_size)
+            self._owned.append(self.extractor)
+        if config.near_dup_max_distance >= 0:
+            self.near_dups = NearDuplicateIndex(state, max_distance=config.near_dup_max_distance)
+        self.url_index = NotionUrlIndex(
+            config.notion_token, config.database_id, store=state, service=self.notion_api, http=self.http_pool.http,
+            snapshot=self.snapshot, near_dups=self.near_dups,
+        )
+        self.summary_cache = SummaryCache(state, max_entries=config.summary_cache_max_entries)
+        if config.summary_mode == "batch" and not config.test_mode:
+            self.batch = BatchSummarizer(self.openai, state, service=self.openai_api, model=config.summary_model)
+        # TEST_MODE writes nothing, so it must not leave anything to resume either.
+        self.journal = RunJournal(state) if not config.test_mode else None
+
+    def _semantic_index(self):
+        config = self.config
+        try:
+            from .semantic_index import HashingEmbedder, OpenAIEmbedder, SemanticIndex
+        except ImportError as exc:  # NumPy: `uv sync --extra semantic`
+            logger.warning(f"Semantic index disabled, NumPy is not installed: {exc}")
+            return None
+        if config.embedding_model == "local":
+            embedder = HashingEmbedder(config.embedding_dimensions)
+        else:
+            embedder = OpenAIEmbedder(
+                lambda: self.openai, model=config.embedding_model, dimensions=config.embedding_dimensions,
+                service=self.openai_api,
+            )
+        return SemanticIndex(self.state, config.embedding_path, embedder, batch_size=config.embedding_batch_size)
+
+    def _embed(self, article: Article | None = None) -> None:
+        # Queue a written page (or, without one, embed what is queued). The page
+        # exists either way, so a failed embedding request only costs its vector.
+        try:
+            if article is None:
+                self.semantic.flush()
+            else:
+                text = f"{article.title}\n{article.summary or ''}"
+                self.semantic.queue(article.page_id, article.link, article.title, text)
+        except Exception as exc:
+            logger.warning(f"Semantic index: embedding failed, pages left unindexed: {exc}")
+
+    def _prefetch(self) -> None:
+        if self.config.notion_token and self.config.notion_database_id:
+            self.url_index.prefetch(full=self.config.dedup_full_sync)
+            if self.config.shard_count > 1 and self.url_index.loaded and not self.url_index.fingerprints:
+                logger.warning(
+                    f"The Notion database has no '{FINGERPRINT_PROPERTY}' rich_text property: same-content and "
+                    "near-duplicate checks only see this shard's own articles"
+                )
+            return
+        # Dry runs without Notion credentials only check against what is known locally.
+        for url in self.state.iter_urls():
+            self.url_index.add(url)
+        self.url_index.loaded = True
+        logger.info(f"URL index: Notion not configured, using {len(self.url_index)} locally known URLs")
+
+    def _resumed(self) -> list[Article]:
+        # Entries an interrupted run left half-done continue where they stopped.
+        articles = []
+        for item in self.journal.resumable() if self.journal is not None else []:
+            articles.append(Article(
+                title=item.get("title") or item["key"], link=item.get("link") or item["key"],
+                feed_url=item.get("feed_url") or "", published=item.get("published"), text=item.get("text") or "",
+                digest=item.get("digest"), simhash=item.get("simhash"), summary=item.get("summary"),
+                resumed=item["stage"],
+            ))
+        if articles:
+            logger.info(f"Resuming {len(articles)} entries from the run journal")
+        return articles
+
+    def _collect(self, feed_results) -> tuple[list[Article], dict]:
+        config = self.config
+        articles = self._resumed()
+        resumed_keys = {journal_key(article.link) for article in articles}
+
+        # Only entries past each feed's high-water mark (see select_new_entries),
+        # and of those only the ones this shard owns.
+        store = None if config.backfill else self.state
+        shard = (config.shard_index, config.shard_count)
+        selected = {}
+        for result in feed_results:
+            selected[result.url] = select_new_entries(result, store=store, limit=config.feed_entry_limit, shard=shard)
+            for e in selected[result.url]:
+                if journal_key(e.link) not in resumed_keys:
+                    articles.append(Article(title=e.title, link=e.link, feed_url=result.url, entry=e))
+        new_count = sum(len(entries) for entries in selected.values())
+        where = "(backfill, watermarks ignored)" if config.backfill else "past the watermarks"
+        if config.shard:
+            where += f" for shard {config.shard}"
+        logger.info(f"Selected {new_count} of {sum(len(r.entries) for r in feed_results)} feed entries {where}")
+        return articles, selected
+
+    def _stream(self, sources: list[str]):
+        # Archive entries one at a time: the pipeline pulls the next one only when
+        # its first queue has room, so nothing is read ahead of the workers.
+        config = self.config
+        resumed = self._resumed()
+        resumed_keys = {journal_key(article.link) for article in resumed}
+        self.total_entries = len(resumed)
+        yield from resumed
+        for source, e in iter_archive(sources, http=self.http_pool.http):
+            if config.shard_count > 1 and shard_of(e.link, config.shard_count) != config.shard_index:
+                continue
+            if journal_key(e.link) in resumed_keys:
+                continue
+            self.total_entries += 1
+            yield Article(title=e.title, link=e.link, feed_url=source, entry=e)
+
+    def _write_finished_batches(self) -> int:
+        # Write whatever earlier runs' batches have produced by now.
+        batch = self.batch
+        batch.poll()
+        ready = []
+        for item in batch.ready():
+            if self.url_index.exists(item["link"]):
+                batch.mark_written(item["link"])
+                continue
+            ready.append(Article(
+                title=item["title"], link=item["link"], feed_url=item["feed_url"],
+                published=item["published"], digest=item["digest"], summary=item["summary"],
+            ))
+        if not ready:
+            return 0
+        logger.info(f"Writing {len(ready)} summaries from finished batches")
+        stages = [Stage("write", self.write_stage, self.config.write_concurrency)]
+        return asyncio.run(run_stages(ready, stages, on_error=self.on_error)).completed
+
+    def run(self, feeds: list[str] | None = None, sources: list[str] | None = None) -> dict:
+        """Run once over `feeds` (default: the config's feeds file) and return the run report.
+
+        With `sources` (OPML lists, feed archives, sitemaps; see archive.iter_archive)
+        those are streamed through the pipeline instead and no feed state is kept.
+        """
+        started = time.monotonic()
+        config = self.config
+        metrics = self.metrics
+        self.check()
+        if feeds is None and not sources:
+            feeds = load_feeds(config.feeds_file)
+        try:
+            self._open()
+            state = self.state
+            phase_started = time.monotonic()
+            self._prefetch()
+            phases = {"prefetch": time.monotonic() - phase_started}
+
+            if sources:
+                feed_results, selected = [], {}
+                all_entries = self._stream(sources)
+            else:
+                if self.scheduler is not None:
+                    due = self.scheduler.due(feeds)
+                    metrics.inc("feeds_not_due", len(feeds) - len(due))
+                    logger.info(f"Feed schedule: {len(due)} of {len(feeds)} feeds due")
+                    feeds = due
+                phase_started = time.monotonic()
+                # A backfill fetches every feed in full (no conditional GET).
+                feed_results = fetch_feeds(
+                    feeds, store=None if config.backfill else state, max_workers=config.feed_fetch_workers,
+                    per_host=config.feed_fetch_per_host, http=self.http_pool.http,
+                )
+                phases["feeds"] = time.monotonic() - phase_started
+                for result in feed_results:
+                    status = "error" if result.error else str(result.status)
+                    metrics.inc("feed_fetches", status=status)
+                    metrics.inc("downloaded_bytes", result.size, source="feed")
+                    metrics.observe("feed_fetch_seconds", result.elapsed)
+
+                all_entries, selected = self._collect(feed_results)
+                self.total_entries = len(all_entries)
+
+            resumed_count = self._write_finished_batches() if self.batch is not None else 0
+
+            extract_concurrency = config.extract_concurrency
+            if self.extractor is not None:
+                # Enough threads waiting on the pool to fill every process with whole chunks.
+                extract_concurrency = max(extract_concurrency, 2 * self.extractor.processes * self.extractor.chunk_size)
+            stages = [
+                Stage("fetch", self.fetch_stage, config.fetch_concurrency),
+                Stage("extract", self.extract_stage, extract_concurrency),
+                Stage("presummarize", self.presummarize_stage, config.extract_concurrency),
+                Stage("summarize", self.summarize_stage, config.summarize_concurrency),
+                Stage("write", self.write_stage, config.write_concurrency),
+            ]
+            phase_started = time.monotonic()
+            run_result = asyncio.run(run_stages(
+                all_entries, stages, queue_size=config.pipeline_queue_size, on_error=self.on_error
+            ))
+            phases["pipeline"] = time.monotonic() - phase_started
+
+            queued_count = 0
+            if self.batch is not None:
+                queued_count = run_result.dropped.pop("summarize", 0)
+                self.batch.submit()
+
+            self._save_feed_state(feed_results, selected, run_result)
+            added_count = run_result.completed + resumed_count
+            skipped_count = sum(run_result.dropped.values())
+            self._log_summary(added_count, skipped_count, queued_count, run_result)
+            if self.journal is not None:
+                self.journal.compact()
+            if self.snapshot is not None and not config.test_mode:
+                self.snapshot.export()
+            if self.semantic is not None:
+                self._embed()
+                self.semantic.maybe_build_ivf(config.semantic_ivf_min_rows)
+            return self._report(started, phases, added_count, skipped_count, run_result)
+        finally:
+            for resource in reversed(self._owned):
+                resource.close()
+            self._owned.clear()
+
+    def _save_feed_state(self, feed_results, selected: dict, run_result) -> None:
+        # TEST_MODE writes nothing, so the next real run must still see these entries.
+        if self.config.test_mode:
+            return
+        limit = self.config.feed_entry_limit
+        # Feeds with an entry that failed keep their old validators so the entry is retried next run.
+        failed_feeds = {article.feed_url for article, _, _ in run_result.failed}
+        failed_links = {article.link for article, _, _ in run_result.failed}
+        # Feeds cut off by FEED_ENTRY_LIMIT must be fetched in full again for the rest.
+        failed_feeds |= {url for url, entries in selected.items() if limit and len(entries) >= limit}
+        for result in feed_results:
+            done = [(entry_id(e), entry_timestamp(e)) for e in selected[result.url] if e.link not in failed_links]
+            if done:
+                self.state.mark_entries_seen(result.url, done)
+            if self.scheduler is not None:
+                self.scheduler.update(result)
+                if result.url in failed_feeds:
+                    self.scheduler.retry_next_run(result.url)
+            if result.error or result.not_modified or result.url in failed_feeds:
+                continue
+            self.state.save_feed_validators(result.url, result.etag, result.modified, result.status)
+
+    def _log_summary(self, added_count: int, skipped_count: int, queued_count: int, run_result) -> None:
+        for service in (self.notion_api, self.openai_api):
+            if service.calls:
+                logger.info(f"{service.name}: {service.calls} calls, {service.retries} retries ({service.throttled} throttled)")
+        self.http_pool.log_stats()
+        summary_cache = self.summary_cache
+        if summary_cache.hits or summary_cache.misses:
+            logger.info(f"Summary cache: {summary_cache.hits} hits, {summary_cache.misses} misses ({len(summary_cache)} entries)")
+        logger.info(f"Added: {added_count}, Skipped: {skipped_count}, Failed: {len(run_result.failed)}")
+        if self.batch is not None:
+            logger.info(f"Queued for batch: {queued_count}, ledger: {self.batch.counts()}")
+
+    def _extraction_stats(self, elapsed: float) -> dict:
+        # Per core = per CPU second spent extracting in the worker processes.
+        extractor = self.extractor
+        cpu = extractor.cpu_seconds
+        return {
+            "processes": extractor.processes,
+            "chunk_size": extractor.chunk_size,
+            "pages": extractor.documents,
+            "input_chars": extractor.input_chars,
+            "cpu_seconds": cpu,
+            "pages_per_core_s": extractor.documents / cpu if cpu else 0.0,
+            "chars_per_core_s": extractor.input_chars / cpu if cpu else 0.0,
+            "utilization": cpu / (elapsed * extractor.processes) if elapsed else 0.0,
+        }
+
+    def _report(self, started: float, phases: dict, added_count: int, skipped_count: int, run_result) -> dict:
+        config = self.config
+        metrics = self.metrics
+        metrics.merge({"histograms": {"stage_seconds": [
+            {"labels": {"stage": name}, **histogram.summary()} for name, histogram in run_result.timings.items()
+        ]}})
+        for name, seconds in phases.items():
+            metrics.set("phase_seconds", seconds, phase=name)
+        metrics.inc("entries", added_count, outcome="added")
+        for name, count in run_result.dropped.items():
+            metrics.inc("entries", count, outcome=f"dropped_at_{name}")
+        for _, name, _ in run_result.failed:
+            metrics.inc("entries", outcome=f"failed_at_{name}")
+        for service in (self.notion_api, self.openai_api):
+            metrics.inc("api_calls", service.calls, service=service.name)
+            metrics.inc("api_retries", service.retries, service=service.name)
+            metrics.inc("api_throttled", service.throttled, service=service.name)
+        metrics.inc("summary_cache_lookups", self.summary_cache.hits, result="hit")
+        metrics.inc("summary_cache_lookups", self.summary_cache.misses, result="miss")
+        if self.semantic is not None:
+            metrics.inc("embedded_pages", self.semantic.embedded)
+            metrics.inc("openai_tokens", getattr(self.semantic.embedder, "tokens", 0), direction="embedding")
+        http_stats = self.http_pool.stats()
+        for host, stats in http_stats["hosts"].items():
+            metrics.inc("http_requests", stats["requests"], host=host)
+            metrics.inc("http_connections", stats["connections"], host=host)
+        elapsed = time.monotonic() - started
+        metrics.set("run_seconds", elapsed)
+
+        report = {
+            "version": REPORT_VERSION,
+            "finished_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "shard": config.shard,
+            "entries": self.total_entries,
+            "added": added_count,
+            "skipped": skipped_count,
+            "failed": len(run_result.failed),
+            "elapsed": elapsed,
+            "entries_per_s": self.total_entries / elapsed if elapsed else 0.0,
+            "phases": phases,
+            "stages": run_result.stage_stats(),
+            "http": http_stats,
+            "metrics": metrics.report(),
+        }
+        if self.extractor is not None and self.extractor.documents:
+            report["extraction"] = stats = self._extraction_stats(phases.get("pipeline", 0.0))
+            logger.info(
+                f"Extraction: {stats['pages']} pages on {stats['processes']} processes, "
+                f"{stats['pages_per_core_s']:.1f} pages/s and {stats['chars_per_core_s'] / 1e6:.2f}M chars/s per core "
+                f"({stats['utilization']:.0%} of the pool busy)"
+            )
+        if config.run_report_path:
+            previous = load_report(config.run_report_path)
+            if previous:
+                for line in compare_reports(previous, report):
+                    logger.info(f"Since last run: {line}")
+            write_atomic(config.run_report_path, json.dumps(report, ensure_ascii=False, indent=2))
+        if config.metrics_textfile:
+            write_atomic(config.metrics_textfile, metrics.to_prometheus())
+        return report
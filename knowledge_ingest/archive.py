@@ -0,0 +1,185 @@
+"""Streaming readers for backfill sources: OPML lists, feed archives and sitemaps.
+
+Every source is parsed incrementally (XMLPullParser) and each finished
+<item> / <entry> / <url> element is removed from the tree as soon as it has
+been turned into an entry, so reading a feed history or a sitemap dump of
+any size keeps the same memory footprint. Sources are local files
+(optionally gzip-compressed) or http(s) URLs, downloaded as a stream.
+"""
+import calendar
+import gzip
+import logging
+import time
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import httpx
+
+from .http_pool import shared_pool
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+# OPML -> feed -> archive pages, sitemap index -> sitemap: deeper nesting is a loop or a mistake.
+MAX_DEPTH = 4
+# Pages of a paged / archived feed (RFC 5005) followed from one source.
+MAX_ARCHIVE_PAGES = 1000
+ARCHIVE_RELS = ("prev-archive", "next")
+
+
+class ArchiveEntry(dict):
+    """Feed entry read from an archive; supports the attribute access of feedparser entries."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+def _text(elem, *names: str) -> str | None:
+    for child in elem:
+        if _local(child.tag) in names:
+            return "".join(child.itertext()).strip() or None
+    return None
+
+
+def parse_date(value: str | None) -> time.struct_time | None:
+    """UTC struct_time (like feedparser's *_parsed) of an RFC 822 or ISO 8601 date."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return time.gmtime(calendar.timegm(parsed.utctimetuple()))
+
+
+def _entry(elem) -> ArchiveEntry | None:
+    kind = _local(elem.tag)
+    entry = ArchiveEntry()
+    if kind == "url":  # sitemap: only the page, its text is downloaded later
+        entry["link"] = _text(elem, "loc")
+        entry["title"] = _text(elem, "title") or entry["link"]
+        published = _text(elem, "publication_date", "lastmod")
+    else:
+        link = _text(elem, "link")
+        for child in elem:
+            if _local(child.tag) == "link" and child.get("href") and child.get("rel", "alternate") == "alternate":
+                link = child.get("href")
+                break
+        entry["link"] = link
+        entry["title"] = _text(elem, "title") or link
+        entry["id"] = _text(elem, "guid", "id") or link
+        published = _text(elem, "pubdate", "published", "date", "updated")
+        content = _text(elem, "encoded", "content")
+        summary = _text(elem, "description", "summary")
+        if content:
+            entry["content"] = [ArchiveEntry(value=content)]
+        if summary:
+            entry["summary"] = summary
+    if not entry["link"]:
+        return None
+    entry["published_parsed"] = parse_date(published)
+    return entry
+
+
+def _chunks(source: str, http):
+    if source.startswith(("http://", "https://")):
+        with http.stream("GET", source, timeout=60) as resp:
+            resp.raise_for_status()
+            gzipped = source.endswith(".gz") and resp.headers.get("Content-Encoding") != "gzip"
+            raw = resp.iter_bytes(READ_SIZE)
+            yield from _gunzip(raw) if gzipped else raw
+        return
+    opener = gzip.open if source.endswith(".gz") else open
+    with opener(source, "rb") as f:
+        while chunk := f.read(READ_SIZE):
+            yield chunk
+
+
+def _gunzip(chunks):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+
+def _read(source: str, http, found: list):
+    # Entries of one document; nested sources (OPML feeds, sitemaps of an index,
+    # older archive pages) are appended to `found` as (kind, url).
+    parser = XMLPullParser(events=("start", "end"))
+    stack = []
+    for chunk in _chunks(source, http):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                if _local(elem.tag) == "outline" and elem.get("xmlUrl"):
+                    found.append(("feed", elem.get("xmlUrl")))
+                continue
+            stack.pop()
+            kind = _local(elem.tag)
+            if kind in ("item", "entry") or (kind == "url" and len(stack) == 1):
+                entry = _entry(elem)
+                if entry is not None:
+                    yield entry
+            elif kind == "sitemap" and len(stack) == 1:
+                loc = _text(elem, "loc")
+                if loc:
+                    found.append(("sitemap", loc))
+            elif kind == "link" and elem.get("rel") in ARCHIVE_RELS and elem.get("href") and len(stack) <= 2:
+                found.append(("page", elem.get("href")))
+            else:
+                continue
+            # Done with this element: drop it so the tree never grows.
+            if stack:
+                stack[-1].remove(elem)
+    parser.close()
+
+
+def iter_archive(sources: list[str], http=None):
+    """(source, entry) for every entry of `sources`, read lazily in order.
+
+    A source is an OPML list (each feed it lists is read), an RSS / Atom
+    feed (older pages linked with rel="prev-archive" or "next" are followed)
+    or a sitemap / sitemap index. A source that fails is logged and skipped.
+    """
+    http = http or shared_pool().http
+    seen = set()
+
+    def walk(source: str, depth: int):
+        if depth > MAX_DEPTH:
+            return
+        # Archive pages of the same feed are read one after another, not nested.
+        pages = [source]
+        for page in pages:
+            if page in seen:
+                continue
+            seen.add(page)
+            found = []
+            try:
+                for entry in _read(page, http, found):
+                    yield source, entry
+            except (OSError, ParseError, httpx.HTTPError, httpx.InvalidURL, EOFError, zlib.error) as exc:
+                logger.warning(f"Archive source failed: {page}: {exc}")
+            for kind, url in found:
+                if kind == "page":
+                    if len(pages) < MAX_ARCHIVE_PAGES:
+                        pages.append(url)
+                else:
+                    yield from walk(url, depth + 1)
+
+    for source in sources:
+        yield from walk(source, 0)
@@ -0,0 +1,229 @@
+import hashlib
+import io
+import json
+import logging
+import time
+
+from .urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# https://platform.openai.com/docs/guides/batch — per-batch request limit.
+MAX_REQUESTS_PER_BATCH = 50000
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Requests are resubmitted a few times in a row before the item is set aside as failed.
+MAX_ATTEMPTS = 3
+REQUEUE_STATUS = f"CASE WHEN attempts % {MAX_ATTEMPTS} = 0 THEN 'failed' ELSE 'queued' END"
+# Failed items are queued again after this long, doubling with every failed round
+# (up to 2 ** MAX_BACKOFF_DOUBLINGS times): their feed entries are past the
+# watermark, so the ledger is the only place they are still known.
+FAILED_RETRY_DELAY = 24 * 3600
+MAX_BACKOFF_DOUBLINGS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    batch_id TEXT PRIMARY KEY,
+    input_file_id TEXT,
+    status TEXT,
+    created_at REAL,
+    request_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS batch_items (
+    custom_id TEXT PRIMARY KEY,
+    batch_id TEXT,
+    status TEXT NOT NULL,
+    title TEXT,
+    link TEXT,
+    feed_url TEXT,
+    published TEXT,
+    digest TEXT,
+    body TEXT,
+    summary TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS batch_items_status ON batch_items(status);
+"""
+
+
+def batch_custom_id(link: str) -> str:
+    return hashlib.sha1(normalize_url(link).encode("utf-8")).hexdigest()
+
+
+class BatchSummarizer:
+    """Summaries through the OpenAI Batch API, tracked in a local job ledger.
+
+    Items go through queued -> submitted -> summarized -> written (or
+    failed after MAX_ATTEMPTS submissions, queued again after a back-off,
+    see FAILED_RETRY_DELAY). The ledger
+    lives in the state database (state_store.StateStore), so a batch
+    submitted by one run is picked up, polled and written by the next.
+    """
+
+    def __init__(self, client, store, service=None, model: str = "gpt-4o-mini"):
+        self.client = client
+        self.store = store
+        self.service = service
+        self.model = model
+        store.executescript(SCHEMA)
+
+    def _call(self, fn, *args, **kwargs):
+        if self.service is None:
+            return fn(*args, **kwargs)
+        return self.service.call(fn, *args, **kwargs)
+
+    def is_pending(self, link: str) -> bool:
+        # Anything in the ledger that is not written yet will be written by a later run.
+        rows = self.store.execute(
+            "SELECT 1 FROM batch_items WHERE custom_id = ? AND status NOT IN ('written', 'failed')",
+            (batch_custom_id(link),),
+        )
+        return bool(rows)
+
+    def add(self, article, prompt: str) -> None:
+        body = {"model": self.model, "messages": [{"role": "user", "content": prompt}]}
+        self.store.execute(
+            "INSERT INTO batch_items "
+            "(custom_id, status, title, link, feed_url, published, digest, body, updated_at) "
+            "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(custom_id) DO UPDATE SET status = 'queued', attempts = 0, body = excluded.body, "
+            "digest = excluded.digest, updated_at = excluded.updated_at "
+            "WHERE batch_items.status = 'failed'",
+            (
+                batch_custom_id(article.link), article.title, article.link, article.feed_url,
+                article.published, article.digest, json.dumps(body, ensure_ascii=False), time.time(),
+            ),
+        )
+
+    def requeue_failed(self) -> int:
+        """Queue the failed items whose back-off has passed; returns how many."""
+        now = time.time()
+        with self.store.transaction() as conn:
+            requeued = conn.execute(
+                "UPDATE batch_items SET status = 'queued', updated_at = ? "
+                "WHERE status = 'failed' AND body IS NOT NULL AND updated_at <= ? - ? * "
+                f"(1 << min(max(attempts / {MAX_ATTEMPTS} - 1, 0), {MAX_BACKOFF_DOUBLINGS}))",
+                (now, now, FAILED_RETRY_DELAY),
+            ).rowcount
+        if requeued:
+            logger.info(f"Queued {requeued} failed batch requests again after their back-off")
+        return requeued
+
+    def submit(self) -> list[str]:
+        """Upload every queued request and create batches; returns the new batch IDs."""
+        self.requeue_failed()
+        batch_ids = []
+        while True:
+            rows = self.store.execute(
+                "SELECT custom_id, body FROM batch_items WHERE status = 'queued' LIMIT ?",
+                (MAX_REQUESTS_PER_BATCH,),
+            )
+            if not rows:
+                return batch_ids
+
+            buf = io.BytesIO()
+            for custom_id, body in rows:
+                line = {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": json.loads(body)}
+                buf.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+
+            uploaded = self._call(self.client.files.create, file=("batch.jsonl", buf.getvalue()), purpose="batch")
+            batch = self._call(
+                self.client.batches.create,
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+            with self.store.transaction() as conn:
+                conn.execute(
+                    "INSERT INTO batch_jobs (batch_id, input_file_id, status, created_at, request_count) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (batch.id, uploaded.id, batch.status, time.time(), len(rows)),
+                )
+                conn.executemany(
+                    "UPDATE batch_items SET status = 'submitted', batch_id = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE custom_id = ?",
+                    [(batch.id, time.time(), custom_id) for custom_id, _ in rows],
+                )
+            logger.info(f"Submitted batch {batch.id} with {len(rows)} requests")
+            batch_ids.append(batch.id)
+
+    def poll(self) -> int:
+        """Check unfinished batches and store their results; returns the number of new summaries."""
+        jobs = self.store.execute("SELECT batch_id FROM batch_jobs WHERE status NOT IN ('completed', 'failed', 'expired', 'cancelled')")
+        summarized = 0
+        for (batch_id,) in jobs:
+            batch = self._call(self.client.batches.retrieve, batch_id)
+            if batch.status not in TERMINAL_STATUSES:
+                counts = getattr(batch, "request_counts", None)
+                done = f" ({counts.completed}/{counts.total})" if counts else ""
+                logger.info(f"Batch {batch_id}: {batch.status}{done}")
+                continue
+
+            if batch.output_file_id:
+                summarized += self._store_output(batch.output_file_id)
+            if batch.error_file_id:
+                self._store_errors(batch.error_file_id)
+
+            with self.store.transaction() as conn:
+                conn.execute("UPDATE batch_jobs SET status = ? WHERE batch_id = ?", (batch.status, batch_id))
+                # Expired/cancelled batches may be partially done; queue the rest again.
+                conn.execute(
+                    f"UPDATE batch_items SET status = {REQUEUE_STATUS}, batch_id = NULL, updated_at = ? "
+                    "WHERE batch_id = ? AND status = 'submitted'",
+                    (time.time(), batch_id),
+                )
+            logger.info(f"Batch {batch_id}: {batch.status}")
+        return summarized
+
+    def _store_output(self, file_id: str) -> int:
+        content = self._call(self.client.files.content, file_id)
+        updates = []
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            choices = (response.get("body") or {}).get("choices") or []
+            if choices:
+                updates.append((choices[0]["message"]["content"], time.time(), record["custom_id"]))
+        self.store.executemany(
+            "UPDATE batch_items SET status = 'summarized', summary = ?, body = NULL, updated_at = ? "
+            "WHERE custom_id = ? AND status = 'submitted'",
+            updates,
+        )
+        return len(updates)
+
+    def _store_errors(self, file_id: str) -> None:
+        content = self._call(self.client.files.content, file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            error = record.get("error") or (record.get("response") or {}).get("body", {}).get("error")
+            logger.warning(f"Batch request {record.get('custom_id')} failed: {error}")
+            # Failed requests go back into the queue for the next batch.
+            self.store.execute(
+                f"UPDATE batch_items SET status = {REQUEUE_STATUS}, batch_id = NULL, error = ?, updated_at = ? "
+                "WHERE custom_id = ? AND status = 'submitted'",
+                (json.dumps(error, ensure_ascii=False), time.time(), record.get("custom_id")),
+            )
+
+    def ready(self) -> list[dict]:
+        rows = self.store.execute(
+            "SELECT custom_id, title, link, feed_url, published, digest, summary "
+            "FROM batch_items WHERE status = 'summarized'"
+        )
+        keys = ("custom_id", "title", "link", "feed_url", "published", "digest", "summary")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def mark_written(self, link: str) -> None:
+        self.store.execute(
+            "UPDATE batch_items SET status = 'written', summary = NULL, updated_at = ? WHERE custom_id = ?",
+            (time.time(), batch_custom_id(link)),
+        )
+
+    def counts(self) -> dict:
+        return dict(self.store.execute("SELECT status, COUNT(*) FROM batch_items GROUP BY status"))
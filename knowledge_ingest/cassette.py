@@ -0,0 +1,274 @@
+"""Record every outbound HTTP interaction of a run and replay it offline.
+
+A cassette is a zip file with three members: `meta.json` (the run's
+settings without the secrets, the feed list or archive sources, and the
+Notion / OpenAI base URLs), `state.sqlite3` (a copy of the state database
+as it was when the run started, so the replay selects, dedups and caches
+exactly like the recorded run did) and `interactions.jsonl` (one request /
+response pair per line, in the order they completed). Feeds, article pages,
+Notion and OpenAI all go through http_pool.HttpPool, so installing on its
+transport sees every request of the run.
+
+Request headers are not kept (they carry the API keys); requests are
+matched on method, URL and a digest of the body.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, defaultdict
+from dataclasses import asdict, fields
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+# Never written to a cassette.
+SECRET_FIELDS = ("notion_token", "openai_key")
+# Base URLs of the APIs; the recorded URLs only match when the replay uses the same ones.
+BASE_URL_VARS = ("NOTION_BASE_URL", "OPENAI_BASE_URL")
+# Headers that describe the transfer rather than the response; bodies are stored decoded.
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "set-cookie")
+
+
+def _digest(body: bytes) -> str | None:
+    return hashlib.sha1(body).hexdigest() if body else None
+
+
+class CassetteRecorder:
+    """Writes the interactions of one run to the cassette at `path`.
+
+    Use as a context manager around the run: the state database is copied
+    on entry and the cassette is finished on exit, also when the run fails,
+    so a crash can be replayed. `install(pool)` puts the recorder in front of
+    the transport of an http_pool.HttpPool.
+    """
+
+    def __init__(self, path: str, config, feeds: list[str] | None = None, sources: list[str] | None = None):
+        self.path = path
+        self.config = config
+        self.meta = {
+            "version": VERSION,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": {k: v for k, v in asdict(config).items() if k not in SECRET_FIELDS},
+            "feeds": feeds,
+            "sources": sources,
+            "env": {name: os.environ[name] for name in BASE_URL_VARS if os.getenv(name)},
+        }
+        self.interactions = 0
+        self._lock = threading.Lock()
+        self._zip = None
+        self._stream = None
+
+    def __enter__(self) -> "CassetteRecorder":
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        if os.path.exists(self.config.state_db):
+            copy = _copy_state(self.config.state_db)
+            try:
+                self._zip.write(copy, "state.sqlite3")
+            finally:
+                os.remove(copy)
+        self._stream = self._zip.open("interactions.jsonl", "w", force_zip64=True)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        with self._lock:
+            self._stream.close()
+            self.meta["interactions"] = self.interactions
+            self._zip.writestr("meta.json", json.dumps(self.meta, ensure_ascii=False, indent=2))
+            self._zip.close()
+        logger.info(f"Cassette: {self.interactions} interactions recorded to {self.path} "
+                    f"({os.path.getsize(self.path) / 1e6:.1f} MB)")
+
+    def install(self, pool) -> None:
+        pool.transport = RecordingTransport(pool.transport, self)
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._stream.write(line.encode("utf-8"))
+            self.interactions += 1
+
+
+def _copy_state(path: str) -> str:
+    # SQLite's backup API copies a consistent snapshot, WAL included.
+    fd, copy = tempfile.mkstemp(prefix="cassette-state-", suffix=".sqlite3")
+    os.close(fd)
+    src, dst = sqlite3.connect(path), sqlite3.connect(copy)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+    return copy
+
+
+class RecordingTransport(httpx.BaseTransport):
+    # Reads each response in full (decoded), writes it to the cassette and hands
+    # the caller an in-memory copy. Transport errors are recorded too.
+
+    def __init__(self, inner: httpx.BaseTransport, recorder: CassetteRecorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        record = {"method": request.method, "url": str(request.url), "body": _digest(request.read())}
+        try:
+            resp = self.inner.handle_request(request)
+        except httpx.TransportError as exc:
+            self.recorder.write({**record, "error": type(exc).__name__, "message": str(exc)})
+            raise
+        try:
+            body = resp.read()
+        finally:
+            resp.close()
+        headers = [(k, v) for k, v in resp.headers.multi_items() if k not in DROPPED_HEADERS]
+        record.update(status=resp.status_code, headers=headers)
+        try:
+            record["text"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            record["data"] = base64.b64encode(body).decode("ascii")
+        self.recorder.write(record)
+        extensions = {k: v for k, v in resp.extensions.items() if k in ("http_version", "reason_phrase")}
+        return httpx.Response(resp.status_code, headers=headers, content=body, extensions=extensions)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class Cassette:
+    """A recorded run, read back for `replay`.
+
+    `install(pool)` replaces the transport of an http_pool.HttpPool so no
+    request leaves the process. A request is answered with the next unused
+    recording of the same method, URL and body; failing that (request
+    bodies with a random multipart boundary, a setting changed since the
+    recording) with the next one of the same method and URL, and a request
+    repeated more often than recorded gets the last answer again. Anything
+    else fails with httpx.ConnectError, like an unreachable host.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with zipfile.ZipFile(path) as zf:
+            self.meta = json.loads(zf.read("meta.json"))
+            if self.meta.get("version") != VERSION:
+                raise ValueError(f"{path}: unsupported cassette version {self.meta.get('version')}")
+            self.state = zf.read("state.sqlite3") if "state.sqlite3" in zf.namelist() else None
+            with zf.open("interactions.jsonl") as f:
+                self.records = [json.loads(line) for line in f]
+        self._exact = defaultdict(list)
+        self._loose = defaultdict(list)
+        for i, record in enumerate(self.records):
+            self._exact[record["method"], record["url"], record["body"]].append(i)
+            self._loose[record["method"], record["url"]].append(i)
+        self._used = [False] * len(self.records)
+        self._lock = threading.Lock()
+        self.outcomes = Counter()
+
+    @property
+    def config(self) -> dict:
+        return self.meta["config"]
+
+    @property
+    def feeds(self) -> list[str] | None:
+        # The feeds actually fetched: the scheduler of the recorded run left the others out.
+        feeds = self.meta.get("feeds")
+        return None if feeds is None else [url for url in feeds if self._fetched(url)]
+
+    def _fetched(self, url: str) -> bool:
+        try:
+            return ("GET", str(httpx.URL(url))) in self._loose
+        except httpx.InvalidURL:
+            return False
+
+    @property
+    def sources(self) -> list[str] | None:
+        return self.meta.get("sources")
+
+    def restore_state(self, path: str) -> None:
+        if self.state is not None:
+            with open(path, "wb") as f:
+                f.write(self.state)
+
+    def install(self, pool) -> None:
+        pool.transport = ReplayTransport(self)
+
+    def answer(self, request: httpx.Request) -> dict | None:
+        key = (request.method, str(request.url))
+        exact = self._exact.get((*key, _digest(request.read())), [])
+        loose = self._loose.get(key, [])
+        with self._lock:
+            for outcome, candidates in (("exact", exact), ("loose", loose)):
+                for i in candidates:
+                    if not self._used[i]:
+                        self._used[i] = True
+                        self.outcomes[outcome] += 1
+                        return self.records[i]
+            candidates = exact or loose
+            self.outcomes["repeated" if candidates else "unmatched"] += 1
+            return self.records[candidates[-1]] if candidates else None
+
+    def log_stats(self) -> None:
+        unused = self._used.count(False)
+        logger.info(
+            f"Cassette: {self.outcomes['exact']} exact, {self.outcomes['loose']} by URL only, "
+            f"{self.outcomes['repeated']} repeated, {self.outcomes['unmatched']} unmatched; "
+            f"{unused} of {len(self.records)} recordings unused"
+        )
+
+
+class ReplayTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        record = self.cassette.answer(request)
+        if record is None:
+            logger.debug(f"Cassette: no recording for {request.method} {request.url}")
+            raise httpx.ConnectError(f"not in the cassette: {request.method} {request.url}", request=request)
+        if "error" in record:
+            error = getattr(httpx, record["error"], None)
+            if not (isinstance(error, type) and issubclass(error, httpx.TransportError)):
+                error = httpx.TransportError
+            raise error(record["message"], request=request)
+        body = base64.b64decode(record["data"]) if "data" in record else record["text"].encode("utf-8")
+        return httpx.Response(record["status"], headers=record["headers"], content=body, request=request)
+
+    def close(self) -> None:
+        pass
+
+
+def replay_config(cassette: Cassette, config_cls, workdir: str, **overrides):
+    """Settings of the recorded run, pointed at `workdir` and with nothing leaving it.
+
+    Everything the run writes locally (state, indexes, report, snapshot) goes
+    to `workdir`, the client-side rate limits are off (nothing is sent, so
+    the run goes as fast as it can) and so is the feed scheduler: the feeds
+    are the ones the recorded run fetched.
+    """
+    known = {f.name for f in fields(config_cls)}
+    values = {k: v for k, v in cassette.config.items() if k in known}
+    values.update(
+        notion_token="replay", openai_key="replay",
+        state_db=os.path.join(workdir, "state.sqlite3"),
+        search_db=os.path.join(workdir, "search_index.sqlite3"),
+        embedding_path=os.path.join(workdir, "embeddings.f32"),
+        run_report_path=os.path.join(workdir, "run_report.json"),
+        http_cache_path="off", snapshot_path=None, metrics_textfile=None,
+        feed_schedule=False, notion_rps=0, openai_rps=0,
+    )
+    values.update(overrides)
+    cassette.restore_state(values["state_db"])
+    # Set before the pipeline modules are imported (notion_index reads it at import).
+    for name, value in cassette.meta.get("env", {}).items():
+        os.environ[name] = value
+    return config_cls(**values)
@@ -0,0 +1,432 @@
+"""Command line entry point: `python -m knowledge_ingest <command>`.
+
+Only the standard library and the SQLite state store are imported up
+front; `run` / `dry-run` / `backfill` / `replay` load the pipeline (httpx, feedparser,
+the Notion and OpenAI SDKs) when they start, `stats`, `search` and
+`merge-reports` never do.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from .config import ROOT_DIR, Config, load_dotenv
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    # Suppress noisy HTTP logs
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
+def cmd_run(args, sources: list[str] | None = None, **overrides) -> int:
+    from .app import IngestRun
+
+    setup_logging()
+    if args.shard:
+        overrides["shard_index"], overrides["shard_count"] = args.shard
+    if args.record:
+        # Every article page has to reach the cassette, not come out of the page cache.
+        overrides["http_cache_path"] = "off"
+        return _record(args.record, Config.from_env(**overrides), sources)
+    IngestRun(Config.from_env(**overrides)).run(sources=sources)
+    return 0
+
+
+def _record(path: str, config: Config, sources: list[str] | None) -> int:
+    from .app import IngestRun, load_feeds
+    from .cassette import CassetteRecorder
+    from .http_pool import HttpPool
+
+    feeds = None if sources else load_feeds(config.feeds_file)
+    pool = HttpPool.from_env()
+    try:
+        with CassetteRecorder(path, config, feeds=feeds, sources=sources) as recorder:
+            recorder.install(pool)
+            IngestRun(config, http_pool=pool).run(feeds=feeds, sources=sources)
+    finally:
+        pool.close()
+    return 0
+
+
+def cmd_replay(args) -> int:
+    import tempfile
+    from contextlib import ExitStack
+
+    from .cassette import Cassette, replay_config
+
+    setup_logging()
+    cassette = Cassette(args.cassette)
+    logger.info(f"Replaying {len(cassette.records)} interactions recorded {cassette.meta['recorded_at']}")
+    with tempfile.TemporaryDirectory(prefix="replay-") as workdir:
+        overrides = {"run_report_path": args.output} if args.output else {}
+        config = replay_config(cassette, Config, workdir, **overrides)
+        # Imported after replay_config has set the recorded API base URLs.
+        from .app import IngestRun
+        from .http_pool import HttpPool
+        from .profiling import StackSampler, thread_profile
+
+        pool = HttpPool.from_env()
+        cassette.install(pool)
+        sampler = None
+        try:
+            with ExitStack() as hooks:
+                if args.profile:
+                    hooks.enter_context(thread_profile(args.profile))
+                if args.sample:
+                    sampler = hooks.enter_context(StackSampler(args.interval / 1000))
+                started = time.perf_counter()
+                IngestRun(config, http_pool=pool).run(feeds=cassette.feeds, sources=cassette.sources)
+                elapsed = time.perf_counter() - started
+        finally:
+            pool.close()
+    if sampler is not None:
+        sampler.write(args.sample)
+    cassette.log_stats()
+    logger.info(f"Replay finished in {elapsed:.2f}s")
+    return 0
+
+
+def cmd_backfill(args) -> int:
+    overrides = {"backfill": True}
+    if args.processes is not None:
+        overrides["extract_processes"] = args.processes
+    elif args.sources and not os.getenv("EXTRACT_PROCESSES"):
+        # Archives are extraction-bound: use every core unless told otherwise.
+        overrides["extract_processes"] = os.cpu_count() or 1
+    if args.chunk_size is not None:
+        overrides["extract_chunk_size"] = args.chunk_size
+    return cmd_run(args, sources=args.sources, **overrides)
+
+
+def _shard_arg(value: str) -> tuple[int, int]:
+    from .sharding import parse_shard
+
+    try:
+        return parse_shard(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def cmd_merge_reports(args) -> int:
+    from .metrics import Metrics, load_report, merge_reports, write_atomic
+
+    setup_logging()
+    reports = []
+    for path in args.reports:
+        report = load_report(path)
+        if report is None:
+            logger.warning(f"Skipping {path}: not a run report")
+            continue
+        reports.append(report)
+    if not reports:
+        logger.error("No run reports to merge")
+        return 1
+    config = Config.from_env()
+    merged = merge_reports(reports)
+    output = args.output or config.run_report_path
+    write_atomic(output, json.dumps(merged, ensure_ascii=False, indent=2))
+    if config.metrics_textfile:
+        metrics = Metrics()
+        metrics.merge(merged["metrics"])
+        write_atomic(config.metrics_textfile, metrics.to_prometheus())
+    logger.info(
+        f"Merged {len(reports)} reports ({', '.join(merged['shards'])}): {merged['added']} added, "
+        f"{merged['skipped']} skipped, {merged['failed']} failed of {merged['entries']} in {merged['elapsed']:.1f}s"
+    )
+    return 0
+
+
+def _table_exists(store, name: str) -> bool:
+    return bool(store.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)))
+
+
+def collect_stats(config: Config) -> dict:
+    """Summary of the state database and the last run report, without touching the network."""
+    from .state_store import StateStore
+
+    stats = {"state_db": os.path.abspath(config.state_db)}
+    if not os.path.exists(config.state_db):
+        stats["error"] = "state database does not exist yet"
+        return stats
+    stats["state_db_bytes"] = os.path.getsize(config.state_db)
+    store = StateStore(config.state_db)
+    try:
+        stats["pages"] = store.page_count()
+        stats["notion_sync_cursor"] = store.get_meta("notion_sync_cursor")
+        feeds = []
+        rows = store.execute(
+            "SELECT f.url, f.last_status, f.last_fetched_at, MAX(e.published), COUNT(e.entry_id) "
+            "FROM feeds f LEFT JOIN feed_entries e ON e.feed_url = f.url GROUP BY f.url ORDER BY f.url"
+        )
+        for url, status, fetched_at, watermark, seen in rows:
+            feeds.append({
+                "url": url, "last_status": status, "last_fetched_at": fetched_at,
+                "watermark": watermark, "seen_entries": seen,
+            })
+        if _table_exists(store, "feed_schedule"):
+            schedule = {url: (interval, next_due) for url, interval, next_due in store.execute(
+                "SELECT url, interval, next_due FROM feed_schedule"
+            )}
+            for feed in feeds:
+                feed["poll_interval"], feed["next_due"] = schedule.get(feed["url"], (None, None))
+        stats["feeds"] = feeds
+        if _table_exists(store, "journal"):
+            stats["journal"] = dict(store.execute(
+                "SELECT j.stage, COUNT(*) FROM journal j "
+                "JOIN (SELECT key, MAX(seq) AS last FROM journal GROUP BY key) l ON l.last = j.seq GROUP BY j.stage"
+            ))
+        if _table_exists(store, "summary_cache"):
+            stats["summary_cache"] = store.execute("SELECT COUNT(*) FROM summary_cache")[0][0]
+        if _table_exists(store, "simhash"):
+            stats["simhash"] = store.execute("SELECT COUNT(*) FROM simhash")[0][0]
+        if _table_exists(store, "embeddings"):
+            stats["embeddings"] = store.execute("SELECT COUNT(*) FROM embeddings")[0][0]
+        if _table_exists(store, "articles"):
+            stats["snapshot_articles"] = store.execute("SELECT COUNT(*) FROM articles")[0][0]
+        if _table_exists(store, "batch_items"):
+            stats["batch_items"] = dict(store.execute("SELECT status, COUNT(*) FROM batch_items GROUP BY status"))
+    finally:
+        store.close()
+
+    if os.path.exists(config.search_db):
+        from .search_index import SearchIndex
+
+        search = SearchIndex(config.search_db)
+        try:
+            stats["search_index"] = len(search)
+        finally:
+            search.close()
+
+    if config.http_cache_path != "off" and os.path.exists(config.http_cache_path):
+        from .http_cache import HttpCache
+
+        cache = HttpCache(config.http_cache_path)
+        try:
+            stats["http_cache"] = f"{len(cache)} pages, {cache.size / 1e6:.1f} MB"
+        finally:
+            cache.close()
+
+    try:
+        with open(config.run_report_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        stats["last_run"] = {
+            key: report.get(key)
+            for key in ("finished_at", "entries", "added", "skipped", "failed", "elapsed", "entries_per_s")
+        }
+    except (OSError, ValueError):
+        stats["last_run"] = None
+    return stats
+
+
+def _format_time(ts: float | None) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "-"
+
+
+def cmd_stats(args) -> int:
+    stats = collect_stats(Config.from_env())
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+    print(f"State DB: {stats['state_db']}")
+    if "error" in stats:
+        print(f"  {stats['error']}")
+        return 1
+    print(f"  {stats['state_db_bytes'] / 1024:.0f} KiB, {stats['pages']} Notion pages known, "
+          f"synced up to {stats['notion_sync_cursor'] or '-'}")
+    for key, label in (
+        ("summary_cache", "Summary cache entries"), ("simhash", "SimHash fingerprints"),
+        ("snapshot_articles", "Snapshot articles"), ("search_index", "Search index pages"),
+        ("embeddings", "Embedded pages"), ("http_cache", "Page cache"),
+    ):
+        if key in stats:
+            print(f"  {label}: {stats[key]}")
+    for key, label in (("journal", "Journal (latest stage)"), ("batch_items", "Batch ledger")):
+        if stats.get(key):
+            print(f"  {label}: " + ", ".join(f"{k} {v}" for k, v in sorted(stats[key].items())))
+    print(f"Feeds: {len(stats['feeds'])}")
+    for feed in stats["feeds"]:
+        print(f"  {feed['url']}")
+        print(f"    last fetch {_format_time(feed['last_fetched_at'])} ({feed['last_status'] or '-'}), "
+              f"watermark {_format_time(feed['watermark'])}, {feed['seen_entries']} entries seen")
+        if feed.get("poll_interval"):
+            print(f"    polled every {feed['poll_interval'] / 3600:.1f}h, next due {_format_time(feed['next_due'])}")
+    run = stats["last_run"]
+    if run:
+        print(f"Last run: {run['finished_at']}, {run['added']} added, {run['skipped']} skipped, "
+              f"{run['failed']} failed of {run['entries']} in {run['elapsed']:.1f}s")
+    return 0
+
+
+def cmd_search(args) -> int:
+    from .search_index import SearchIndex
+
+    config = Config.from_env()
+    if not os.path.exists(config.search_db):
+        print(f"Search index {os.path.abspath(config.search_db)} does not exist yet", file=sys.stderr)
+        return 1
+    index = SearchIndex(config.search_db)
+    try:
+        started = time.perf_counter()
+        results = index.search(
+            " ".join(args.query), since=args.since, until=args.until, limit=args.limit,
+            order="date" if args.by_date else "rank",
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        index.close()
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+    for result in results:
+        print(f"{(result['published'] or '-')[:10]}  {result['title']}")
+        print(f"            {result['url']}")
+        summary = (result["summary"] or "").strip().splitlines()
+        if summary:
+            print(f"            {summary[0][:100]}")
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+def _open_semantic(config: Config):
+    if config.embedding_model == "off":
+        print("EMBEDDING_MODEL is not set; the semantic index is off", file=sys.stderr)
+        return None
+    if not os.path.exists(config.embedding_path) or not os.path.exists(config.state_db):
+        print(f"Semantic index {os.path.abspath(config.embedding_path)} does not exist yet", file=sys.stderr)
+        return None
+    from .semantic_index import HashingEmbedder, OpenAIEmbedder, SemanticIndex
+    from .state_store import StateStore
+
+    if config.embedding_model == "local":
+        embedder = HashingEmbedder(config.embedding_dimensions)
+    else:
+        def client():
+            from openai import OpenAI
+
+            return OpenAI(api_key=config.openai_key)
+
+        embedder = OpenAIEmbedder(client, model=config.embedding_model, dimensions=config.embedding_dimensions)
+    return SemanticIndex(StateStore(config.state_db), config.embedding_path, embedder)
+
+
+def _print_hits(hits: list[dict], as_json: bool, elapsed: float) -> None:
+    if as_json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+        return
+    for hit in hits:
+        print(f"{hit['score']:.3f}  {hit['title']}")
+        print(f"       {hit['url']}")
+    print(f"{len(hits)} results in {elapsed * 1000:.1f} ms")
+
+
+def cmd_semantic(args) -> int:
+    if not args.query and not args.related:
+        print("Give a query or --related URL_OR_PAGE_ID", file=sys.stderr)
+        return 2
+    index = _open_semantic(Config.from_env())
+    if index is None:
+        return 1
+    try:
+        started = time.perf_counter()
+        nprobe = 0 if args.exact else args.nprobe
+        if args.related:
+            hits = index.related(args.related, k=args.limit, nprobe=nprobe)
+        else:
+            hits = index.search(" ".join(args.query), k=args.limit, nprobe=nprobe)
+        elapsed = time.perf_counter() - started
+    finally:
+        index.store.close()
+    _print_hits(hits, args.json, elapsed)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="knowledge_ingest", description="RSS -> summarize -> Notion ingestion.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="fetch new feed entries, summarize them and write them to Notion")
+    run.set_defaults(func=cmd_run)
+    dry_run = commands.add_parser(
+        "dry-run", help="same as run, but summarized locally and nothing is written (TEST_MODE)"
+    )
+    dry_run.set_defaults(func=lambda args: cmd_run(args, test_mode=True))
+    backfill = commands.add_parser(
+        "backfill",
+        help="process every entry the feeds still list, ignoring ETags and watermarks, "
+             "or every entry of archive sources (OPML, feed archives, sitemaps)",
+    )
+    backfill.add_argument(
+        "sources", nargs="*", metavar="SOURCE",
+        help="OPML list, RSS/Atom feed or sitemap (file, .gz or URL) to stream instead of the feeds file",
+    )
+    backfill.add_argument(
+        "--processes", type=int, help="HTML extraction processes (default: EXTRACT_PROCESSES, or every core with SOURCEs)"
+    )
+    backfill.add_argument("--chunk-size", type=int, help="pages per extraction task (default: EXTRACT_CHUNK_SIZE or 8)")
+    backfill.set_defaults(func=cmd_backfill)
+    for command in (run, dry_run, backfill):
+        command.add_argument(
+            "--shard", type=_shard_arg, metavar="I/N",
+            help="only process the entries of shard I of N (by URL hash); overrides SHARD",
+        )
+        command.add_argument(
+            "--record", metavar="CASSETTE",
+            help="also save every HTTP request and response of the run (feeds, pages, Notion, OpenAI) "
+                 "and the starting state to this file, for `replay`",
+        )
+    replay = commands.add_parser(
+        "replay", help="run a recorded run again from its cassette, offline and without rate limits"
+    )
+    replay.add_argument("cassette", help="file written by run / dry-run / backfill --record")
+    replay.add_argument("--profile", metavar="FILE", help="cProfile the replay (all threads) into this pstats file")
+    replay.add_argument("--sample", metavar="FILE", help="sample every thread's stack into this folded-stack file")
+    replay.add_argument("--interval", type=float, default=5.0, help="sampling interval in ms (default: 5)")
+    replay.add_argument("-o", "--output", help="where to write the run report (default: a temporary directory)")
+    replay.set_defaults(func=cmd_replay)
+    merge = commands.add_parser("merge-reports", help="combine the run reports of the shards of one run")
+    merge.add_argument("reports", nargs="+", help="run report JSON files, one per shard")
+    merge.add_argument("-o", "--output", help="where to write the merged report (default: RUN_REPORT_PATH)")
+    merge.set_defaults(func=cmd_merge_reports)
+    stats = commands.add_parser("stats", help="show the local state (feeds, watermarks, journal, caches, last run)")
+    stats.add_argument("--json", action="store_true", help="print the stats as JSON")
+    stats.set_defaults(func=cmd_stats)
+    search = commands.add_parser("search", help="full-text search over the written pages (titles, texts, summaries)")
+    search.add_argument("query", nargs="+", help="terms that must all match; `term*` matches a prefix")
+    search.add_argument("--since", help="published on or after this date (YYYY-MM-DD)")
+    search.add_argument("--until", help="published on or before this date (YYYY-MM-DD)")
+    search.add_argument("--limit", type=int, default=20, help="maximum number of results (default: 20)")
+    search.add_argument("--by-date", action="store_true", help="newest first instead of by relevance")
+    search.add_argument("--json", action="store_true", help="print the results as JSON")
+    search.set_defaults(func=cmd_search)
+    semantic = commands.add_parser(
+        "semantic", help="pages closest in meaning to a query, or related to a page (EMBEDDING_MODEL, needs NumPy)"
+    )
+    semantic.add_argument("query", nargs="*", help="text to search for")
+    semantic.add_argument("--related", metavar="URL_OR_PAGE_ID", help="pages related to this page instead of a query")
+    semantic.add_argument("--limit", type=int, default=10, help="maximum number of results (default: 10)")
+    semantic.add_argument("--nprobe", type=int, default=8, help="IVF lists to search when the index has them (default: 8)")
+    semantic.add_argument("--exact", action="store_true", help="score every vector instead of using the IVF lists")
+    semantic.add_argument("--json", action="store_true", help="print the results as JSON")
+    semantic.set_defaults(func=cmd_semantic)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Works locally with .env and in GitHub Actions via secrets/env.
+    load_dotenv(os.getenv("DOTENV_PATH") or os.path.join(ROOT_DIR, ".env"))
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
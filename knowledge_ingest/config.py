@@ -0,0 +1,231 @@
+import os
+import uuid
+from dataclasses import dataclass, fields
+
+from .http_cache import DEFAULT_HTTP_CACHE_PATH
+from .search_index import DEFAULT_SEARCH_PATH
+from .sharding import parse_shard, shard_path
+from .state_store import DEFAULT_STATE_PATH
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+TRUTHY = ("1", "true", "yes", "y", "on")
+# Defaults that get a per-shard name unless set explicitly.
+SHARDED_PATHS = ("state_db", "search_db", "embedding_path", "run_report_path", "http_cache_path")
+
+
+def load_dotenv(path: str) -> None:
+    """Copy KEY=VALUE lines of `path` into os.environ (values in the file win)."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            key = key.strip()
+            value = value.strip().strip('"').strip("'")
+            if key:
+                os.environ[key] = value
+
+
+def _flag(name: str) -> bool:
+    return (os.getenv(name) or "").lower() in TRUTHY
+
+
+@dataclass
+class Config:
+    """Settings of one ingest run; `from_env` maps the documented environment variables."""
+
+    notion_token: str | None = None
+    notion_database_id: str | None = None
+    openai_key: str | None = None
+    feeds_file: str = os.path.join(ROOT_DIR, "feeds.json")
+    # JSON report of every run (counts, per-stage latencies, bytes, tokens, retries,
+    # cache hits); the previous one is compared against before it is replaced.
+    run_report_path: str = os.path.join(ROOT_DIR, ".cache", "reports", "run_report.json")
+    # Optional Prometheus textfile (node_exporter textfile collector) with the same metrics.
+    metrics_textfile: str | None = None
+    # Optional NDJSON snapshot of every ingested article (snapshot.KnowledgeSnapshot),
+    # read by knowledge-site instead of paging through Notion.
+    snapshot_path: str | None = None
+    test_mode: bool = False
+    # Local dedup cache; kept between runs (GitHub Actions caches the .cache directory).
+    state_db: str = DEFAULT_STATE_PATH
+    dedup_full_sync: bool = False
+    # Compressed on-disk HTTP cache of downloaded article pages (http_cache.HttpCache),
+    # capped at `http_cache_max_mb`; pages stay fresh at least `http_cache_min_ttl`
+    # seconds whatever their headers say. "off" turns it off.
+    http_cache_path: str = DEFAULT_HTTP_CACHE_PATH
+    http_cache_max_mb: float = 200.0
+    http_cache_min_ttl: float = 30 * 24 * 3600.0
+    # Full-text index of the written pages (`python -m knowledge_ingest search`).
+    search_db: str = DEFAULT_SEARCH_PATH
+    # Embeddings of the written pages for `semantic` / `related` (needs NumPy):
+    # "off", "local" (offline hashing embedder) or an OpenAI embedding model.
+    embedding_model: str = "off"
+    embedding_dimensions: int = 256
+    embedding_path: str = os.path.join(ROOT_DIR, ".cache", "embeddings.f32")
+    embedding_batch_size: int = 64
+    # Build IVF lists for approximate search from this many vectors on (0 = always exact).
+    semantic_ivf_min_rows: int = 50000
+    feed_fetch_workers: int = 8
+    feed_fetch_per_host: int = 2
+    # Optional cap on new entries taken from one feed per run (0 = no cap); the
+    # rest are picked up by the next run.
+    feed_entry_limit: int = 0
+    # Only fetch the feeds that are due (feed_schedule.FeedScheduler): each feed is
+    # polled about once per expected post, every `feed_min_interval` seconds at
+    # most and every `feed_max_interval` at least. Backfills fetch every feed.
+    feed_schedule: bool = True
+    feed_min_interval: float = 3600.0
+    feed_max_interval: float = 7 * 24 * 3600.0
+    # Take every entry the feeds still list, ignoring the watermarks (backfill).
+    backfill: bool = False
+    # Shard `shard_index` of `shard_count` (`--shard i/N`): every shard fetches the
+    # feeds but only processes the entries whose normalized URL hashes to it.
+    shard_index: int = 0
+    shard_count: int = 1
+    # Workers per pipeline stage (fetch -> extract -> presummarize -> summarize -> write;
+    # presummarize uses `extract_concurrency`) and the
+    # size of the queues between them.
+    fetch_concurrency: int = 4
+    extract_concurrency: int = 2
+    # HTML extraction in this many worker processes (0 = on the pipeline threads),
+    # `extract_chunk_size` pages per task; `backfill SOURCE...` uses every core.
+    extract_processes: int = 0
+    extract_chunk_size: int = 8
+    summarize_concurrency: int = 4
+    write_concurrency: int = 2
+    pipeline_queue_size: int = 8
+    # Client-side pacing (requests/s) per service and the number of retries allowed per run.
+    # The rates are for all shards together; each shard paces itself at its share.
+    notion_rps: float = 3.0
+    openai_rps: float = 5.0
+    retry_budget: int = 100
+    # "sync": one chat completion per entry (low latency). "batch": queue prompts for
+    # the OpenAI Batch API; results are written by a later run.
+    summary_mode: str = "sync"
+    summary_model: str = "gpt-4o-mini"
+    # Seconds per OpenAI request (the SDK's default is 600). Not HTTP_TIMEOUT: long
+    # completions and Batch API file uploads take far longer than a page fetch.
+    openai_timeout: float = 600.0
+    # Characters of article text extracted (parsing stops there); the prompt
+    # itself is sized in tokens below.
+    article_text_limit: int = 40000
+    # Article tokens sent in one summary prompt. Longer articles are split into
+    # chunks of `summary_chunk_tokens` (at most `summary_max_chunks`), summarized
+    # `summary_chunk_concurrency` at a time and reduced into one summary.
+    summary_input_tokens: int = 2500
+    summary_chunk_tokens: int = 2000
+    summary_max_chunks: int = 8
+    summary_chunk_concurrency: int = 4
+    # Local extractive (TextRank) summaries instead of the LLM: "off", "short"
+    # (cleaned text under `local_summary_min_tokens`, e.g. RSS teasers) or "all".
+    # TEST_MODE always summarizes locally.
+    local_summary: str = "short"
+    local_summary_min_tokens: int = 150
+    # Text up to this many times `summary_input_tokens` is cut down to its
+    # highest-ranked sentences so it fits one prompt (0 = never; longer text
+    # is map-reduced).
+    compress_factor: float = 2.0
+    summary_cache_max_entries: int = 5000
+    # SimHash near-duplicate check: max differing bits out of 64 (negative disables it),
+    # and the minimum text length worth fingerprinting (short teasers look alike).
+    near_dup_max_distance: int = 3
+    near_dup_min_chars: int = 300
+
+    @classmethod
+    def from_env(cls, **overrides) -> "Config":
+        env = {
+            "notion_token": os.getenv("NOTION_TOKEN"),
+            "notion_database_id": os.getenv("NOTION_DATABASE_ID"),
+            "openai_key": os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_KEY"),
+            "feeds_file": os.getenv("FEEDS_FILE"),
+            "run_report_path": os.getenv("RUN_REPORT_PATH"),
+            "metrics_textfile": os.getenv("METRICS_TEXTFILE"),
+            "snapshot_path": os.getenv("SNAPSHOT_PATH"),
+            "test_mode": _flag("TEST_MODE"),
+            "state_db": os.getenv("INGEST_STATE_DB"),
+            "dedup_full_sync": _flag("DEDUP_FULL_SYNC"),
+            "search_db": os.getenv("SEARCH_DB"),
+            "http_cache_path": os.getenv("HTTP_CACHE_PATH"),
+            "http_cache_max_mb": os.getenv("HTTP_CACHE_MAX_MB"),
+            "http_cache_min_ttl": os.getenv("HTTP_CACHE_MIN_TTL"),
+            "embedding_model": os.getenv("EMBEDDING_MODEL"),
+            "embedding_dimensions": os.getenv("EMBEDDING_DIMENSIONS"),
+            "embedding_path": os.getenv("EMBEDDING_PATH"),
+            "embedding_batch_size": os.getenv("EMBEDDING_BATCH_SIZE"),
+            "semantic_ivf_min_rows": os.getenv("SEMANTIC_IVF_MIN_ROWS"),
+            "feed_fetch_workers": os.getenv("FEED_FETCH_WORKERS"),
+            "feed_fetch_per_host": os.getenv("FEED_FETCH_PER_HOST"),
+            "feed_entry_limit": os.getenv("FEED_ENTRY_LIMIT"),
+            "feed_schedule": os.getenv("FEED_SCHEDULE"),
+            "feed_min_interval": os.getenv("FEED_MIN_INTERVAL"),
+            "feed_max_interval": os.getenv("FEED_MAX_INTERVAL"),
+            "fetch_concurrency": os.getenv("FETCH_CONCURRENCY"),
+            "extract_concurrency": os.getenv("EXTRACT_CONCURRENCY"),
+            "extract_processes": os.getenv("EXTRACT_PROCESSES"),
+            "extract_chunk_size": os.getenv("EXTRACT_CHUNK_SIZE"),
+            "summarize_concurrency": os.getenv("SUMMARIZE_CONCURRENCY"),
+            "write_concurrency": os.getenv("WRITE_CONCURRENCY"),
+            "pipeline_queue_size": os.getenv("PIPELINE_QUEUE_SIZE"),
+            "notion_rps": os.getenv("NOTION_RPS"),
+            "openai_rps": os.getenv("OPENAI_RPS"),
+            "openai_timeout": os.getenv("OPENAI_TIMEOUT"),
+            "retry_budget": os.getenv("RETRY_BUDGET"),
+            "summary_mode": (os.getenv("SUMMARY_MODE") or "").lower(),
+            "article_text_limit": os.getenv("ARTICLE_TEXT_LIMIT"),
+            "summary_input_tokens": os.getenv("SUMMARY_INPUT_TOKENS"),
+            "summary_chunk_tokens": os.getenv("SUMMARY_CHUNK_TOKENS"),
+            "summary_max_chunks": os.getenv("SUMMARY_MAX_CHUNKS"),
+            "summary_chunk_concurrency": os.getenv("SUMMARY_CHUNK_CONCURRENCY"),
+            "local_summary": (os.getenv("LOCAL_SUMMARY") or "").lower(),
+            "local_summary_min_tokens": os.getenv("LOCAL_SUMMARY_MIN_TOKENS"),
+            "compress_factor": os.getenv("COMPRESS_FACTOR"),
+            "summary_cache_max_entries": os.getenv("SUMMARY_CACHE_MAX_ENTRIES"),
+            "near_dup_max_distance": os.getenv("NEAR_DUP_MAX_DISTANCE"),
+            "near_dup_min_chars": os.getenv("NEAR_DUP_MIN_CHARS"),
+        }
+        kwargs = {}
+        for f in fields(cls):
+            value = env.get(f.name)
+            # Unset / empty variables keep the default, like `os.getenv(...) or default`.
+            if value is None or value == "":
+                continue
+            kwargs[f.name] = _cast(f.default, value)
+        if os.getenv("SHARD"):
+            kwargs["shard_index"], kwargs["shard_count"] = parse_shard(os.environ["SHARD"])
+        kwargs.update(overrides)
+        count = kwargs.get("shard_count", 1)
+        if count > 1:
+            # Shards keep separate local state, so several can run on one machine.
+            index = kwargs.get("shard_index", 0)
+            for name in SHARDED_PATHS:
+                if name not in kwargs:
+                    kwargs[name] = shard_path(getattr(cls, name), index, count)
+        return cls(**kwargs)
+
+    @property
+    def shard(self) -> str | None:
+        return f"{self.shard_index}/{self.shard_count}" if self.shard_count > 1 else None
+
+    @property
+    def database_id(self) -> str | None:
+        # Dashed form (required for some API endpoints/URLs); non-UUIDs are used as-is.
+        if not self.notion_database_id:
+            return self.notion_database_id
+        try:
+            return str(uuid.UUID(self.notion_database_id))
+        except ValueError:
+            return self.notion_database_id
+
+
+def _cast(default, value: str):
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else value.lower() in TRUTHY
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
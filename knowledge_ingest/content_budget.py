@@ -0,0 +1,145 @@
+import functools
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer of the gpt-4o family; used when tiktoken is installed.
+ENCODING = "o200k_base"
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_WORD_RE = re.compile(r"[^\W_]", re.UNICODE)
+_URL_ONLY_RE = re.compile(r"^(https?://|www\.)\S+$", re.IGNORECASE)
+# Captions, credits and calls to action that survive HTML extraction.
+LOW_INFO_RE = re.compile(
+    r"^(photo|image|source|credit|illustration|figure)s?( by)?\s*[:：]"
+    r"|^(photo|image) by\b"
+    r"|^(read more|related( posts| articles)?|recommended|advertisement|sponsored|tags?|categories|share this"
+    r"|click here|continue reading|table of contents|originally published|subscribe to)\b"
+    r"|^(関連記事|あわせて読みたい|目次|広告|シェア|この記事をシェア|続きを読む|タグ)",
+    re.IGNORECASE,
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:  # optional: `uv sync --extra tokens`
+        logger.warning("tiktoken is not installed (`uv sync --extra tokens`), estimating token counts")
+        return None
+    try:
+        return tiktoken.get_encoding(ENCODING)
+    except Exception as exc:  # the BPE file is downloaded on first use
+        logger.warning(f"tiktoken encoding {ENCODING} unavailable, estimating token counts: {exc}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of `text` for the summary model (estimated without tiktoken).
+
+    The estimate counts one token per Japanese / CJK character and one per
+    four other characters, which is close to o200k_base on mixed text.
+    """
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def clean_text(text: str) -> str:
+    """Drop lines that cost tokens without telling the model anything.
+
+    Repeated lines (share bars, bylines printed twice), lines without any
+    letters, bare URLs and caption / call-to-action lines go.
+    """
+    lines = []
+    seen = set()
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line in seen:
+            continue
+        seen.add(line)
+        if not _WORD_RE.search(line) or _URL_ONLY_RE.match(line):
+            continue
+        if len(line) < 80 and LOW_INFO_RE.search(line):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _cut(line: str, max_tokens: int) -> str:
+    # Longest prefix of `line` within `max_tokens`.
+    lo, hi = 0, len(line)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(line[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return line[:lo]
+
+
+def _pieces(text: str, max_tokens: int):
+    # (line, tokens) pairs; lines longer than the budget are split.
+    for line in text.splitlines():
+        tokens = count_tokens(line)
+        while tokens > max_tokens:
+            head = _cut(line, max_tokens) or line[:1]
+            yield head, count_tokens(head)
+            line = line[len(head):]
+            tokens = count_tokens(line)
+        if line:
+            yield line, tokens
+
+
+def fit(text: str, max_tokens: int) -> str:
+    """Leading lines of `text` that fit in `max_tokens`."""
+    kept = []
+    used = 0
+    for line, tokens in _pieces(text, max_tokens):
+        if used + tokens > max_tokens:
+            remaining = max_tokens - used
+            if remaining > 0:
+                kept.append(_cut(line, remaining))
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(part for part in kept if part)
+
+
+def split_chunks(text: str, chunk_tokens: int, max_chunks: int = 0) -> list[str]:
+    """Split `text` on line boundaries into chunks of at most `chunk_tokens`.
+
+    With more than `max_chunks` chunks, the first `max_chunks - 1` and the
+    last one are kept: an article's conclusion is usually at the end.
+    """
+    chunks = []
+    current = []
+    used = 0
+    for line, tokens in _pieces(text, chunk_tokens):
+        if current and used + tokens > chunk_tokens:
+            chunks.append("\n".join(current))
+            current, used = [], 0
+        current.append(line)
+        used += tokens
+    if current:
+        chunks.append("\n".join(current))
+    if max_chunks and len(chunks) > max_chunks:
+        chunks = chunks[:max_chunks - 1] + chunks[-1:]
+    return chunks
+
+
+def plan(text: str, input_tokens: int, chunk_tokens: int, max_chunks: int = 0) -> list[str]:
+    """Cleaned article text as prompt-sized parts.
+
+    One part when the cleaned text fits in `input_tokens` (summarized in a
+    single call), otherwise the chunks to summarize separately and reduce.
+    """
+    cleaned = clean_text(text)
+    if count_tokens(cleaned) <= input_tokens:
+        return [cleaned]
+    return split_chunks(cleaned, chunk_tokens, max_chunks)
@@ -0,0 +1,295 @@
+import logging
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from html import unescape
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # optional: `uv sync --extra fast`
+    _lxml_etree = None
+
+# Subtrees that never contain article text.
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "math", "iframe", "object",
+    "nav", "header", "footer", "aside", "form", "button", "select", "head",
+}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "br", "hr", "li", "ul", "ol", "dl", "dt", "dd",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "figure", "figcaption",
+    "table", "tr", "td", "th", "caption", "title", "body", "html",
+}
+SKIP_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Lines feeds append to every post.
+BOILERPLATE_RE = re.compile(
+    r"was originally published in .+ on Medium, where people are continuing the conversation"
+    r"|^(Share|Follow|Sign up|Sign in|Subscribe|Listen|Get the app)$",
+    re.IGNORECASE,
+)
+_WS_RE = re.compile(r"[ \t\r\f\v\xa0　]+")
+CHUNK_SIZE = 16 * 1024
+
+
+class _Enough(Exception):
+    pass
+
+
+class _TextCollector:
+    """Shared SAX-style handler: drops skipped subtrees, marks block breaks, stops at `limit`."""
+
+    def __init__(self, limit: int):
+        # Collect a little more than needed: boilerplate lines are dropped afterwards.
+        self.budget = int(limit * 1.2) + 200 if limit else 0
+        self.parts: list[str] = []
+        self.size = 0
+        self.skip_depth = 0
+        self.skip_tag = None
+
+    def start(self, tag: str, attrs) -> None:
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.skip_depth:
+            if tag == self.skip_tag and tag not in VOID_TAGS:
+                self.skip_depth += 1
+            return
+        role = dict(attrs).get("role") if attrs else None
+        if tag in SKIP_TAGS or role in SKIP_ROLES:
+            if tag not in VOID_TAGS:
+                self.skip_tag = tag
+                self.skip_depth = 1
+            return
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def end(self, tag: str) -> None:
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.skip_depth:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if not self.skip_depth:
+                    self.skip_tag = None
+            return
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def data(self, text: str) -> None:
+        if self.skip_depth or not text:
+            return
+        self.parts.append(text)
+        self.size += len(text)
+        if self.budget and self.size >= self.budget:
+            raise _Enough
+
+    def text(self, limit: int) -> str:
+        lines = []
+        for line in "".join(self.parts).splitlines():
+            line = _WS_RE.sub(" ", line).strip()
+            if line and not BOILERPLATE_RE.search(line):
+                lines.append(line)
+        text = "\n".join(lines)
+        return text[:limit] if limit else text
+
+
+class _LxmlTarget:
+    # lxml parser target interface (start/end/data/close).
+    def __init__(self, collector: _TextCollector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.start(tag, attrib.items() if attrib else None)
+
+    def end(self, tag):
+        self.collector.end(tag)
+
+    def data(self, text):
+        self.collector.data(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector: _TextCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def _feed(parser, html: str) -> None:
+    # Feed in chunks so parsing stops as soon as enough text has been collected.
+    try:
+        for start in range(0, len(html), CHUNK_SIZE):
+            parser.feed(html[start:start + CHUNK_SIZE])
+        parser.close()
+    except _Enough:
+        pass
+
+
+def _extract_lxml(html: str, limit: int) -> str:
+    collector = _TextCollector(limit)
+    parser = _lxml_etree.HTMLParser(target=_LxmlTarget(collector), remove_comments=True, recover=True)
+    try:
+        _feed(parser, html)
+    except _lxml_etree.LxmlError:
+        # Target parsers raise on close() for documents lxml considers empty.
+        pass
+    return collector.text(limit)
+
+
+def _extract_stdlib(html: str, limit: int) -> str:
+    collector = _TextCollector(limit)
+    _feed(_StdlibParser(collector), html)
+    return collector.text(limit)
+
+
+ENGINE = "lxml" if _lxml_etree is not None else "html.parser"
+
+
+def extract_text(html: str, limit: int = 6000) -> str:
+    """Readable text of `html`, at most `limit` characters (0 = no limit).
+
+    Streams the document through lxml when it is installed, otherwise the
+    stdlib parser, and stops parsing once enough text is collected.
+    Falls back to `strip_html` if the streaming parser fails.
+    """
+    if not html:
+        return ""
+    try:
+        if _lxml_etree is not None:
+            return _extract_lxml(html, limit)
+        return _extract_stdlib(html, limit)
+    except Exception as exc:
+        logger.debug(f"Streaming extraction failed, using BeautifulSoup: {exc}")
+        text = strip_html(html)
+        return text[:limit] if limit else text
+
+
+def _extract_chunk(htmls: list[str], limit: int) -> tuple[list, float]:
+    # Runs in a worker process: (text or error message, failed) per document, and the CPU time used.
+    started = time.process_time()
+    results = []
+    for html in htmls:
+        try:
+            results.append((extract_text(html, limit), False))
+        except Exception as exc:
+            results.append((f"{type(exc).__name__}: {exc}", True))
+    return results, time.process_time() - started
+
+
+class ProcessExtractor:
+    """`extract_text` in a pool of worker processes, for archives too big for one core.
+
+    Pipeline threads call `extract` as usual; documents are collected into
+    chunks of `chunk_size` and each chunk is one task for the pool, so the
+    pickling and IPC cost is paid per chunk, not per page. A thread whose
+    chunk is still incomplete after `linger` seconds sends it as it is.
+    Only documents that callers are waiting on are buffered, so memory is
+    bounded by the number of calling threads.
+    """
+
+    def __init__(self, processes: int, chunk_size: int = 8, linger: float = 0.05):
+        self.processes = max(1, processes)
+        self.chunk_size = max(1, chunk_size)
+        self.linger = linger
+        # Not fork: the pipeline's threads (and their locks) are running already.
+        self.pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._pending: dict[int, list] = {}
+        self.documents = 0
+        self.input_chars = 0
+        self.cpu_seconds = 0.0
+
+    def extract(self, html: str, limit: int = 6000) -> str:
+        if not html:
+            return ""
+        future = Future()
+        with self._lock:
+            pending = self._pending.setdefault(limit, [])
+            pending.append((html, future))
+            chunk = self._pending.pop(limit) if len(pending) >= self.chunk_size else None
+        if chunk:
+            self._dispatch(chunk, limit)
+        try:
+            return future.result(timeout=self.linger)
+        except FutureTimeout:
+            self._flush(limit)
+            return future.result()
+
+    def _flush(self, limit: int) -> None:
+        with self._lock:
+            chunk = self._pending.pop(limit, None)
+        if chunk:
+            self._dispatch(chunk, limit)
+
+    def _dispatch(self, chunk: list, limit: int) -> None:
+        def done(task) -> None:
+            try:
+                results, cpu_seconds = task.result()
+            except Exception as exc:  # BrokenProcessPool etc.
+                for _, future in chunk:
+                    future.set_exception(exc)
+                return
+            with self._lock:
+                self.documents += len(chunk)
+                self.input_chars += sum(len(html) for html, _ in chunk)
+                self.cpu_seconds += cpu_seconds
+            for (_, future), (value, failed) in zip(chunk, results):
+                if failed:
+                    future.set_exception(RuntimeError(f"extraction failed: {value}"))
+                else:
+                    future.set_result(value)
+
+        self.pool.submit(_extract_chunk, [html for html, _ in chunk], limit).add_done_callback(done)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def strip_html(html: str) -> str:
+    # Use BeautifulSoup depending on availability
+    if not html:
+        return ""
+    try:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.extract()
+        text = soup.get_text()
+        # break into lines and remove leading and trailing space on each
+        lines = (line.strip() for line in text.splitlines())
+        # break multi-headlines into a line each
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        # drop blank lines
+        text = '\n'.join(chunk for chunk in chunks if chunk)
+        return text
+    except Exception:
+        # Fallback to simple regex if BS4 fails
+        text = re.sub(r"(?is)<(script|style).*?>.*?</\1>", " ", html)
+        text = re.sub(r"(?s)<[^>]+>", " ", text)
+        text = unescape(text)
+        text = re.sub(r"\s+", " ", text).strip()
+        return text
@@ -0,0 +1,146 @@
+import math
+import re
+from collections import Counter
+
+from .content_budget import count_tokens
+from .near_dup import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python ranking is used without it
+    np = None
+
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？!?])\s*|(?<=\.)\s+(?=[A-Z0-9\"'(])")
+DAMPING = 0.85
+ITERATIONS = 50
+TOLERANCE = 1e-6
+# Ranking is quadratic in the number of sentences; longer texts are ranked on their first ones.
+MAX_SENTENCES = 400
+SUMMARY_SENTENCES = 3
+# Notion rich_text objects hold at most 2000 characters.
+SUMMARY_MAX_CHARS = 1900
+
+
+def split_sentences(text: str) -> list[str]:
+    sentences = []
+    for line in (text or "").splitlines():
+        for sentence in _SENTENCE_END_RE.split(line.strip()):
+            sentence = sentence.strip()
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+
+def _tfidf(sentences: list[list[str]]) -> list[dict[str, float]]:
+    df = Counter(token for tokens in sentences for token in set(tokens))
+    n = len(sentences)
+    vectors = []
+    for tokens in sentences:
+        tf = Counter(tokens)
+        vector = {t: c * (math.log((1 + n) / (1 + df[t])) + 1) for t, c in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        vectors.append({t: v / norm for t, v in vector.items()})
+    return vectors
+
+
+def _rank_numpy(vectors: list[dict[str, float]]) -> list[float]:
+    vocabulary = {t: i for i, t in enumerate({t for v in vectors for t in v})}
+    n = len(vectors)
+    matrix = np.zeros((n, len(vocabulary)))
+    for row, vector in enumerate(vectors):
+        for token, value in vector.items():
+            matrix[row, vocabulary[token]] = value
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    totals = similarity.sum(axis=1, keepdims=True)
+    # Sentences similar to nothing spread their weight evenly.
+    transition = np.divide(similarity, totals, out=np.full_like(similarity, 1.0 / n), where=totals > 0)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * transition.T @ scores
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            return updated.tolist()
+        scores = updated
+    return scores.tolist()
+
+
+def _rank_python(vectors: list[dict[str, float]]) -> list[float]:
+    n = len(vectors)
+    edges = [[] for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            small, large = sorted((vectors[i], vectors[j]), key=len)
+            weight = sum(value * large.get(token, 0.0) for token, value in small.items())
+            if weight > 0:
+                edges[i].append((j, weight))
+                edges[j].append((i, weight))
+    totals = [sum(weight for _, weight in out) for out in edges]
+    scores = [1.0 / n] * n
+    for _ in range(ITERATIONS):
+        dangling = sum(scores[i] for i in range(n) if not totals[i]) / n
+        updated = [(1 - DAMPING) / n + DAMPING * dangling] * n
+        for i, out in enumerate(edges):
+            if totals[i]:
+                share = DAMPING * scores[i] / totals[i]
+                for j, weight in out:
+                    updated[j] += share * weight
+        if sum(abs(a - b) for a, b in zip(updated, scores)) < TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences: list[str]) -> list[float]:
+    """TextRank score of each sentence over a TF-IDF cosine similarity graph.
+
+    Uses NumPy when it is installed, otherwise a pure-Python power iteration
+    over the sparse graph; both give the same scores.
+    """
+    if not sentences:
+        return []
+    vectors = _tfidf([tokenize(sentence) for sentence in sentences])
+    if len(vectors) == 1:
+        return [1.0]
+    return _rank_numpy(vectors) if np is not None else _rank_python(vectors)
+
+
+def _select(sentences: list[str], fits) -> list[str]:
+    # Best-ranked sentences that `fits(chosen, sentence)` accepts, in their original order.
+    ranked = sentences[:MAX_SENTENCES]
+    scores = rank_sentences(ranked)
+    chosen = []
+    for index in sorted(range(len(ranked)), key=lambda i: -scores[i]):
+        if fits(chosen, ranked[index]):
+            chosen.append(index)
+    return [ranked[i] for i in sorted(chosen)]
+
+
+def compress(text: str, max_tokens: int) -> str:
+    """The highest-ranked sentences of `text` that fit in `max_tokens`, in order."""
+    sentences = split_sentences(text)
+    used = 0
+
+    def fits(chosen, sentence):
+        nonlocal used
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            return False
+        used += tokens
+        return True
+
+    return "\n".join(_select(sentences, fits))
+
+
+def local_summary(title: str, text: str, sentences: int = SUMMARY_SENTENCES) -> str:
+    """Extractive summary of `text` (the title when there is no text)."""
+    size = 0
+
+    def fits(chosen, sentence):
+        nonlocal size
+        if len(chosen) >= sentences or size + len(sentence) > SUMMARY_MAX_CHARS:
+            return False
+        size += len(sentence) + 1
+        return True
+
+    picked = _select(split_sentences(text), fits)
+    return "\n".join(picked) if picked else title
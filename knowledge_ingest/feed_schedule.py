@@ -0,0 +1,96 @@
+import time
+
+from .feed_fetch import entry_timestamp
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_schedule (
+    url TEXT PRIMARY KEY,
+    mean_gap REAL,
+    last_entry_at REAL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    interval REAL,
+    next_due REAL
+);
+"""
+# Newest entries the publishing rate is estimated from.
+RATE_WINDOW = 20
+# Interval for a feed whose rate is unknown (fewer than two dated entries).
+DEFAULT_INTERVAL = 24 * 3600
+# A feed silent for this many of its usual gaps has gone quiet; it is polled
+# at this fraction of its silence instead.
+STALE_GAPS = 4
+STALE_FRACTION = 0.25
+# Runs start a little late or early (cron jitter, queueing); a feed due within
+# this fraction of `min_interval` is fetched now rather than a whole run later.
+DUE_SLACK = 0.1
+
+
+def mean_gap(timestamps: list[float]) -> float | None:
+    """Average seconds between the newest RATE_WINDOW publish times, or None."""
+    recent = sorted(timestamps)[-RATE_WINDOW:]
+    if len(recent) < 2 or recent[-1] <= recent[0]:
+        return None
+    return (recent[-1] - recent[0]) / (len(recent) - 1)
+
+
+class FeedScheduler:
+    """When each feed is due to be fetched again, learned from its entries.
+
+    Stored in the state database (state_store.StateStore). After every fetch
+    the feed's publishing rate is estimated from its entries' timestamps and
+    the next poll is about one expected post away, within `min_interval` ..
+    `max_interval`: a feed posting every half hour is fetched on every run,
+    one posting monthly about weekly. Feeds that have been silent for several
+    of their usual gaps, and feeds whose fetch fails, back off further.
+    Feeds the scheduler has never seen are always due.
+    """
+
+    def __init__(self, store, min_interval: float = 3600, max_interval: float = 7 * 24 * 3600):
+        self.store = store
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        store.executescript(SCHEMA)
+
+    def _clamp(self, seconds: float) -> float:
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def due(self, urls: list[str], now: float | None = None) -> list[str]:
+        """The feeds of `urls` whose next poll time has come, in the order given."""
+        now = time.time() if now is None else now
+        next_due = dict(self.store.execute("SELECT url, next_due FROM feed_schedule"))
+        horizon = now + self.min_interval * DUE_SLACK
+        return [url for url in urls if (next_due.get(url) or 0) <= horizon]
+
+    def update(self, result, now: float | None = None) -> float:
+        """Schedule the next fetch after `result` (feed_fetch.FeedResult); returns the interval."""
+        now = time.time() if now is None else now
+        row = self.store.execute(
+            "SELECT mean_gap, last_entry_at, failures, interval FROM feed_schedule WHERE url = ?", (result.url,)
+        )
+        gap, last_entry_at, failures, interval = row[0] if row else (None, None, 0, None)
+        if result.error:
+            failures += 1
+            interval = self._clamp(self.min_interval * 2 ** failures)
+        else:
+            failures = 0
+            # A 304 has no entries; what was learned from the last full fetch still holds.
+            timestamps = [ts for ts in map(entry_timestamp, result.entries) if ts is not None]
+            if timestamps:
+                gap = mean_gap(timestamps) or gap
+                last_entry_at = max(timestamps + [last_entry_at or 0])
+            interval = self._clamp(gap or DEFAULT_INTERVAL)
+            silence = now - last_entry_at if last_entry_at else 0
+            if gap and silence > STALE_GAPS * gap:
+                interval = self._clamp(max(interval, silence * STALE_FRACTION))
+        self.store.execute(
+            "INSERT INTO feed_schedule (url, mean_gap, last_entry_at, failures, interval, next_due) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET mean_gap = excluded.mean_gap, "
+            "last_entry_at = excluded.last_entry_at, failures = excluded.failures, "
+            "interval = excluded.interval, next_due = excluded.next_due",
+            (result.url, gap, last_entry_at, failures, interval, now + interval),
+        )
+        return interval
+
+    def retry_next_run(self, url: str) -> None:
+        # Entries left over (a failed entry, FEED_ENTRY_LIMIT) are taken by the next run.
+        self.store.execute("UPDATE feed_schedule SET next_due = 0 WHERE url = ?", (url,))
@@ -0,0 +1,217 @@
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional: `uv sync --extra zstd`; gzip without it
+    zstandard = None
+
+DEFAULT_HTTP_CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", ".cache", "http_cache.sqlite3")
+# Response headers kept with a body; enough to decode it and to revalidate.
+STORED_HEADERS = ("content-type", "etag", "last-modified", "date", "cache-control", "expires", "age")
+# RFC 9111 4.2.2: heuristic freshness is this fraction of the time since Last-Modified.
+HEURISTIC_FRACTION = 0.1
+# Eviction trims the cache to this fraction of its cap, so it doesn't run on every store.
+EVICT_TO = 0.9
+_DIRECTIVE_RE = re.compile(r"([a-z-]+)(?:=\"?([^\",]*)\"?)?")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER,
+    headers TEXT,
+    codec TEXT,
+    body BLOB,
+    size INTEGER,
+    stored_at REAL,
+    fresh_until REAL,
+    last_used_at REAL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used_at);
+"""
+
+
+def cache_control(headers) -> dict[str, str]:
+    directives = {}
+    for name, value in _DIRECTIVE_RE.findall((headers.get("cache-control") or "").lower()):
+        directives[name] = value
+    return directives
+
+
+def _http_date(value: str | None) -> float | None:
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, now: float) -> float:
+    """Seconds a response stays fresh (RFC 9111 4.2.1), heuristic when it says nothing."""
+    directives = cache_control(headers)
+    if "no-cache" in directives:
+        return 0.0
+    if directives.get("max-age", "").isdigit():
+        return float(directives["max-age"])
+    date = _http_date(headers.get("date")) or now
+    expires = headers.get("expires")
+    if expires is not None:
+        # An invalid Expires (e.g. "0") means already expired.
+        expires_at = _http_date(expires)
+        return max(0.0, expires_at - date) if expires_at else 0.0
+    last_modified = _http_date(headers.get("last-modified"))
+    if last_modified and last_modified < date:
+        return (date - last_modified) * HEURISTIC_FRACTION
+    return 0.0
+
+
+def _compress(body: bytes) -> tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=6).compress(body)
+    return "gzip", gzip.compress(body, compresslevel=6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class HttpCache:
+    """Private HTTP cache (RFC 9111) on disk for article page downloads.
+
+    Lives in its own SQLite file. Bodies are stored compressed (zstd when
+    `zstandard` is installed, gzip otherwise) with the headers needed to
+    decode and revalidate them. A fresh entry is served without touching the
+    network; a stale one is revalidated with If-None-Match / If-Modified-Since
+    and a 304 refreshes it. Responses with `no-store` are never kept.
+    `min_ttl` keeps every stored page fresh at least that long regardless
+    of what the server said (article pages rarely change; 0 follows the
+    headers strictly). Once the stored bodies exceed `max_bytes`, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_HTTP_CACHE_PATH, max_bytes: int = 200 * 1024 * 1024, min_ttl: float = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.min_ttl = min_ttl
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, http, url: str, **kwargs) -> "httpx.Response":
+        """GET `url` through the cache with `http` (an httpx.Client).
+
+        Returns an httpx.Response either way; `response.extensions["cache"]`
+        is "hit" (no request made), "revalidated" (304, body from the cache)
+        or "miss" (downloaded).
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, headers, codec, body, fresh_until FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        stored = None
+        if row is not None:
+            status, headers, codec, body, fresh_until = row
+            try:
+                stored = (status, json.loads(headers), _decompress(codec, body))
+            except ValueError as exc:
+                logger.debug(f"HTTP cache: dropping unreadable entry for {url}: {exc}")
+            if stored is not None and fresh_until > now:
+                self._touch(url, now)
+                return self._response(url, *stored, outcome="hit")
+
+        request_headers = dict(kwargs.pop("headers", None) or {})
+        if stored is not None:
+            if stored[1].get("etag"):
+                request_headers["If-None-Match"] = stored[1]["etag"]
+            if stored[1].get("last-modified"):
+                request_headers["If-Modified-Since"] = stored[1]["last-modified"]
+        resp = http.get(url, headers=request_headers, **kwargs)
+        if resp.status_code == 304 and stored is not None:
+            # RFC 9111 4.3.4: the 304's headers update the stored ones.
+            headers = {**stored[1], **{k: v for k, v in resp.headers.items() if k in STORED_HEADERS}}
+            self._store(url, stored[0], headers, stored[2], now)
+            return self._response(url, stored[0], headers, stored[2], outcome="revalidated")
+        if resp.status_code == 200:
+            headers = {k: v for k, v in resp.headers.items() if k in STORED_HEADERS}
+            self._store(url, resp.status_code, headers, resp.content, now)
+        resp.extensions = {**resp.extensions, "cache": "miss"}
+        return resp
+
+    def _response(self, url: str, status: int, headers: dict, body: bytes, outcome: str) -> "httpx.Response":
+        # Not imported at the top: config imports this module for its default path,
+        # and `stats` / `search` must not load httpx.
+        import httpx
+
+        return httpx.Response(
+            status, headers=headers, content=body, request=httpx.Request("GET", url), extensions={"cache": outcome}
+        )
+
+    def _touch(self, url: str, now: float) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE responses SET last_used_at = ? WHERE url = ?", (now, url))
+
+    def _store(self, url: str, status: int, headers: dict, body: bytes, now: float) -> None:
+        if "no-store" in cache_control(headers):
+            return
+        codec, data = _compress(body)
+        if len(data) > self.max_bytes * (1 - EVICT_TO):
+            return
+        age = headers.get("age") or ""
+        lifetime = freshness_lifetime(headers, now) - (int(age) if age.isdigit() else 0)
+        fresh_until = now + max(self.min_ttl, lifetime)
+        with self._lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (url, status, headers, codec, body, size, stored_at, fresh_until, "
+                "last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(headers), codec, data, len(data), now, fresh_until, now),
+            )
+            self._size += len(data) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Called with the lock held, inside the store's transaction.
+        target = self.max_bytes * EVICT_TO
+        evicted = 0
+        for url, size in self.conn.execute("SELECT url, size FROM responses ORDER BY last_used_at").fetchall():
+            if self._size <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._size -= size
+            evicted += 1
+        logger.debug(f"HTTP cache: evicted {evicted} entries, {self._size / 1e6:.1f} MB left")
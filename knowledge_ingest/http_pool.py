@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+from collections import Counter
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  optional: `uv sync --extra http2`
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _SharedTransport(httpx.BaseTransport):
+    # Hands requests to the pool's transport and counts new connections via
+    # httpcore's trace hook. Closing a client built on it leaves the pool open.
+
+    def __init__(self, pool: "HttpPool"):
+        self.pool = pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        inner = request.extensions.get("trace")
+
+        def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.complete":
+                self.pool._count(host, connections=1)
+            if inner is not None:
+                inner(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        self.pool._count(host, requests=1)
+        return self.pool.transport.handle_request(request)
+
+
+class HttpPool:
+    """Keep-alive connection pool shared by every outbound HTTP request.
+
+    Feeds, article pages, Notion REST queries and both SDKs go through the
+    same `transport`, so connections (and TLS sessions) to a host are reused
+    across the whole run. HTTP/2 is used when `h2` is installed. `http` is
+    the client for direct requests; `client()` builds additional clients
+    over the same connections for the SDKs, which set their own base URL
+    and headers on the client they are given.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 20.0,
+        http2: bool = True,
+    ):
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.transport = httpx.HTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+        self._shared = _SharedTransport(self)
+        self._lock = threading.Lock()
+        self._requests: Counter = Counter()
+        self._connections: Counter = Counter()
+        self.http = self.client(follow_redirects=True)
+
+    @classmethod
+    def from_env(cls) -> "HttpPool":
+        return cls(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS") or 20),
+            max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE") or 10),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY") or 30),
+            timeout=float(os.getenv("HTTP_TIMEOUT") or 20),
+            http2=(os.getenv("HTTP2") or "true").lower() in ("1", "true", "yes", "y", "on"),
+        )
+
+    def client(self, **kwargs) -> httpx.Client:
+        kwargs.setdefault("timeout", self.timeout)
+        return httpx.Client(transport=self._shared, **kwargs)
+
+    def _count(self, host: str, requests: int = 0, connections: int = 0) -> None:
+        with self._lock:
+            self._requests[host] += requests
+            self._connections[host] += connections
+
+    def stats(self) -> dict:
+        """Requests, new connections and reuse ratio, overall and per host."""
+        with self._lock:
+            hosts = {
+                host: {
+                    "requests": count,
+                    "connections": self._connections[host],
+                    "reuse_ratio": _reuse_ratio(count, self._connections[host]),
+                }
+                for host, count in sorted(self._requests.items())
+            }
+            total = sum(self._requests.values())
+            connections = sum(self._connections.values())
+        return {
+            "http2": self.http2,
+            "requests": total,
+            "connections": connections,
+            "reuse_ratio": _reuse_ratio(total, connections),
+            "hosts": hosts,
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        if not stats["requests"]:
+            return
+        protocol = "HTTP/2 enabled" if self.http2 else "HTTP/1.1"
+        logger.info(
+            f"HTTP pool ({protocol}): {stats['requests']} requests over {stats['connections']} connections "
+            f"({stats['reuse_ratio']:.0%} reused)"
+        )
+        for host, s in stats["hosts"].items():
+            logger.info(f"  {host}: {s['requests']} requests, {s['connections']} connections ({s['reuse_ratio']:.0%} reused)")
+
+    def close(self) -> None:
+        self.http.close()
+        self.transport.close()
+
+
+def _reuse_ratio(requests: int, connections: int) -> float:
+    return max(0.0, 1 - connections / requests) if requests else 0.0
+
+
+_shared_pool: HttpPool | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool() -> HttpPool:
+    """Process-wide pool configured from the HTTP_* environment variables."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = HttpPool.from_env()
+        return _shared_pool
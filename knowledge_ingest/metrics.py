@@ -0,0 +1,299 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for both a feed parse and a slow chat completion.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+REPORT_VERSION = 1
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style); memory does not grow with observations."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        # Linear interpolation inside the bucket, like histogram_quantile().
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= rank:
+                inside = (rank - seen) / self.counts[i] if self.counts[i] else 0.0
+                return min(self.max, lower + (bound - lower) * inside)
+            seen += self.counts[i]
+            lower = bound
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+            # Per-bucket counts, so reports of several shards can be merged exactly.
+            "counts": list(self.counts),
+        }
+
+    def merge(self, summary: dict) -> None:
+        """Add the observations of another histogram's `summary()` (same buckets)."""
+        counts = summary.get("counts") or []
+        if len(counts) != len(self.counts):
+            raise ValueError("histogram buckets don't match")
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += summary.get("count", 0)
+        self.sum += summary.get("sum", 0.0)
+        self.max = max(self.max, summary.get("max", 0.0))
+
+
+class Metrics:
+    """Counters, gauges and latency histograms of one run.
+
+    Names are given without the `prefix`; counters get `_total` appended in
+    the Prometheus export. All methods are thread-safe.
+    """
+
+    def __init__(self, prefix: str = "knowledge_ingest"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def merge(self, report: dict) -> None:
+        """Add the metrics of another run's `report()`: counters add up, gauges keep the larger value."""
+        with self._lock:
+            for name, series in report.get("counters", {}).items():
+                for item in series:
+                    key = _key(name, item["labels"])
+                    self._counters[key] = self._counters.get(key, 0) + item["value"]
+            for name, series in report.get("gauges", {}).items():
+                for item in series:
+                    key = _key(name, item["labels"])
+                    self._gauges[key] = max(self._gauges.get(key, item["value"]), item["value"])
+            for name, series in report.get("histograms", {}).items():
+                for item in series:
+                    key = _key(name, item["labels"])
+                    histogram = self._histograms.get(key)
+                    if histogram is None:
+                        histogram = self._histograms[key] = Histogram()
+                    histogram.merge(item)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def report(self) -> dict:
+        def group(items, value):
+            out: dict[str, list] = {}
+            for (name, labels), item in sorted(items, key=lambda kv: kv[0]):
+                out.setdefault(name, []).append({"labels": dict(labels), **value(item)})
+            return out
+
+        with self._lock:
+            return {
+                "counters": group(self._counters.items(), lambda v: {"value": v}),
+                "gauges": group(self._gauges.items(), lambda v: {"value": v}),
+                "histograms": group(self._histograms.items(), Histogram.summary),
+            }
+
+    def to_prometheus(self) -> str:
+        """Text exposition format (node_exporter textfile collector / OpenMetrics-compatible)."""
+        lines = []
+        typed = set()
+
+        def declare(metric: str, kind: str) -> None:
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                declare(metric, "counter")
+                lines.append(f"{metric}{_labels(labels)} {value:g}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                metric = f"{self.prefix}_{name}"
+                declare(metric, "gauge")
+                lines.append(f"{metric}{_labels(labels)} {value:g}")
+            for (name, labels), h in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                metric = f"{self.prefix}_{name}"
+                declare(metric, "histogram")
+                cumulative = 0
+                for bound, count in zip([f"{b:g}" for b in h.buckets] + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_labels(labels, ('le', bound))} {cumulative}")
+                lines.append(f"{metric}_sum{_labels(labels)} {h.sum:g}")
+                lines.append(f"{metric}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple, *extra: tuple) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_atomic(path: str, text: str) -> None:
+    # The textfile collector may read at any time; never expose a half-written file.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def load_report(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compare_reports(previous: dict, current: dict) -> list[str]:
+    """Human-readable changes of the headline numbers between two run reports."""
+    lines = []
+
+    def change(label: str, old, new, unit: str = "") -> None:
+        if not old or new is None:
+            return
+        delta = (new - old) / old
+        lines.append(f"{label}: {old:.3g}{unit} -> {new:.3g}{unit} ({delta:+.0%})")
+
+    change("entries/s", previous.get("entries_per_s"), current.get("entries_per_s"))
+    change("elapsed", previous.get("elapsed"), current.get("elapsed"), "s")
+    for stage, stats in current.get("stages", {}).items():
+        old = previous.get("stages", {}).get(stage)
+        if old:
+            change(f"{stage} p95", old.get("p95"), stats.get("p95"), "s")
+    return lines
+
+
+def merge_reports(reports: list[dict]) -> dict:
+    """One run report for shards that ran side by side (`--shard i/N`).
+
+    Entry counts, counters and HTTP requests add up; elapsed and phase times
+    are those of the slowest shard, since the shards ran in parallel. Stage
+    percentiles come from the merged `stage_seconds` histograms, so they
+    cover the items of every shard.
+    """
+    metrics = Metrics()
+    for report in reports:
+        metrics.merge(report.get("metrics") or {})
+    merged_metrics = metrics.report()
+
+    def total(key: str) -> int:
+        return sum(report.get(key) or 0 for report in reports)
+
+    elapsed = max((report.get("elapsed") or 0.0 for report in reports), default=0.0)
+    phases: dict[str, float] = {}
+    for report in reports:
+        for name, seconds in (report.get("phases") or {}).items():
+            phases[name] = max(phases.get(name, 0.0), seconds)
+
+    histograms = {item["labels"].get("stage"): item for item in merged_metrics["histograms"].get("stage_seconds", [])}
+    stages: dict[str, dict] = {}
+    for report in reports:
+        for name, stats in (report.get("stages") or {}).items():
+            merged = stages.setdefault(name, {"count": 0, "total": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0})
+            merged["count"] += stats.get("count", 0)
+            merged["total"] += stats.get("total", 0.0)
+            merged["max"] = max(merged["max"], stats.get("max", 0.0))
+    for name, merged in stages.items():
+        if name in histograms:
+            merged["p50"], merged["p95"] = histograms[name]["p50"], histograms[name]["p95"]
+
+    hosts: dict[str, dict] = {}
+    for report in reports:
+        for host, stats in ((report.get("http") or {}).get("hosts") or {}).items():
+            merged = hosts.setdefault(host, {"requests": 0, "connections": 0})
+            merged["requests"] += stats.get("requests", 0)
+            merged["connections"] += stats.get("connections", 0)
+    for merged in hosts.values():
+        merged["reuse_ratio"] = _reuse_ratio(merged["requests"], merged["connections"])
+    requests = sum(h["requests"] for h in hosts.values())
+    connections = sum(h["connections"] for h in hosts.values())
+
+    entries = total("entries")
+    return {
+        "version": REPORT_VERSION,
+        "finished_at": max((report.get("finished_at") or "" for report in reports), default=None),
+        "shards": sorted(report.get("shard") or "-" for report in reports),
+        "entries": entries,
+        "added": total("added"),
+        "skipped": total("skipped"),
+        "failed": total("failed"),
+        "elapsed": elapsed,
+        "entries_per_s": entries / elapsed if elapsed else 0.0,
+        "phases": phases,
+        "stages": stages,
+        "http": {
+            "http2": any((report.get("http") or {}).get("http2") for report in reports),
+            "requests": requests,
+            "connections": connections,
+            "reuse_ratio": _reuse_ratio(requests, connections),
+            "hosts": dict(sorted(hosts.items())),
+        },
+        "metrics": merged_metrics,
+    }
+
+
+def _reuse_ratio(requests: int, connections: int) -> float:
+    # Same as http_pool._reuse_ratio; not imported so reports merge without httpx.
+    return max(0.0, 1 - connections / requests) if requests else 0.0
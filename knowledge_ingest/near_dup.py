@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+BITS = 64
+_MASK = (1 << BITS) - 1
+_TOKEN_RE = re.compile(r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS simhash (
+    key TEXT PRIMARY KEY,
+    fp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS simhash_bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS simhash_bands_lookup ON simhash_bands(band, value);
+"""
+BANDS_META_KEY = "simhash_bands"
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            # No spaces in Japanese: use character bigrams as words.
+            tokens.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over token 2-shingles, weighted by frequency."""
+    tokens = tokenize(text)
+    features = Counter(zip(tokens, tokens[1:])) if len(tokens) > 1 else Counter(tokens)
+    weights = [0] * BITS
+    for feature, count in features.items():
+        h = int.from_bytes(hashlib.blake2b(repr(feature).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(BITS):
+            if h >> i & 1:
+                weights[i] += count
+            else:
+                weights[i] -= count
+    fp = 0
+    for i, w in enumerate(weights):
+        if w > 0:
+            fp |= 1 << i
+    return fp
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _to_sql(value: int) -> int:
+    # SQLite integers are signed 64-bit.
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def _from_sql(value: int) -> int:
+    return value & _MASK
+
+
+class NearDuplicateIndex:
+    """SimHash fingerprints with an LSH band index, stored in the state database.
+
+    The 64 bits are split into `max_distance + 1` bands; by the pigeonhole
+    principle two fingerprints within `max_distance` bits share at least
+    one band exactly, so a lookup is a handful of indexed equality queries
+    no matter how many articles are stored.
+    """
+
+    def __init__(self, store, max_distance: int = 3):
+        self.store = store
+        self.max_distance = max(0, max_distance)
+        self.bands = min(BITS, self.max_distance + 1)
+        self._pending: dict[str, int] = {}
+        self._lock = threading.Lock()
+        store.executescript(SCHEMA)
+        if store.get_meta(BANDS_META_KEY) != str(self.bands):
+            self._rebuild_bands()
+
+    def _band_values(self, fp: int) -> list[tuple[int, int]]:
+        width = BITS // self.bands
+        values = []
+        for band in range(self.bands):
+            shift = band * width
+            # The last band takes the remaining bits.
+            size = BITS - shift if band == self.bands - 1 else width
+            values.append((band, _to_sql(fp >> shift & ((1 << size) - 1))))
+        return values
+
+    def _rebuild_bands(self) -> None:
+        rows = self.store.execute("SELECT key, fp FROM simhash")
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM simhash_bands")
+            conn.executemany(
+                "INSERT INTO simhash_bands (band, value, key) VALUES (?, ?, ?)",
+                [(band, value, key) for key, fp in rows for band, value in self._band_values(_from_sql(fp))],
+            )
+        self.store.set_meta(BANDS_META_KEY, str(self.bands))
+        if rows:
+            logger.info(f"Near-duplicate index: rebuilt bands for {len(rows)} fingerprints")
+
+    def find(self, fp: int, exclude: str | None = None) -> tuple[str, int] | None:
+        """Closest stored fingerprint within `max_distance`, as (key, distance)."""
+        best = None
+        seen = set()
+        for band, value in self._band_values(fp):
+            rows = self.store.execute(
+                "SELECT s.key, s.fp FROM simhash_bands b JOIN simhash s ON s.key = b.key "
+                "WHERE b.band = ? AND b.value = ?",
+                (band, value),
+            )
+            for key, other in rows:
+                if key in seen or key == exclude:
+                    continue
+                seen.add(key)
+                distance = hamming(fp, _from_sql(other))
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        return best
+
+    def reserve(self, key: str, fp: int) -> tuple[str, int] | None:
+        """Return the near-duplicate of `fp` if there is one, else hold `fp` for `key`.
+
+        Held fingerprints are matched by other entries of the same run but
+        are only persisted by `add` (once the page is written), so an entry
+        that fails later is not a duplicate of itself on the next run.
+        """
+        with self._lock:
+            for other_key, other in self._pending.items():
+                if other_key != key and hamming(fp, other) <= self.max_distance:
+                    return other_key, hamming(fp, other)
+            match = self.find(fp, exclude=key)
+            if match is None:
+                self._pending[key] = fp
+            return match
+
+    def add(self, key: str, fp: int) -> None:
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM simhash_bands WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT INTO simhash (key, fp) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET fp = excluded.fp",
+                (key, _to_sql(fp)),
+            )
+            conn.executemany(
+                "INSERT INTO simhash_bands (band, value, key) VALUES (?, ?, ?)",
+                [(band, value, key) for band, value in self._band_values(fp)],
+            )
+        with self._lock:
+            self._pending.pop(key, None)
@@ -0,0 +1,298 @@
+import logging
+import os
+import time
+import uuid
+
+import httpx
+
+from .http_pool import shared_pool
+from .urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Overridable so the pipeline can run against a local stand-in of the API.
+NOTION_BASE_URL = (os.getenv("NOTION_BASE_URL") or "https://api.notion.com").rstrip("/")
+NOTION_API_BASE = f"{NOTION_BASE_URL}/v1"
+NOTION_VERSION = "2022-06-28"
+
+SYNC_CURSOR_KEY = "notion_sync_cursor"
+SYNC_DATABASE_KEY = "notion_sync_database_id"
+# Optional rich_text column holding "<content hash> <simhash hex>" of each page, so
+# shards (each with its own state database) see each other's articles.
+FINGERPRINT_PROPERTY = "Fingerprint"
+
+
+def fingerprint_text(digest: str | None, fp: int | None) -> str | None:
+    if not digest:
+        return None
+    return digest if fp is None else f"{digest} {fp:016x}"
+
+
+def parse_fingerprint(page: dict) -> tuple[str | None, int | None]:
+    prop = (page.get("properties") or {}).get(FINGERPRINT_PROPERTY) or {}
+    text = "".join(part.get("plain_text") or (part.get("text") or {}).get("content", "")
+                   for part in prop.get("rich_text") or [])
+    parts = text.split()
+    if not parts:
+        return None, None
+    try:
+        fp = int(parts[1], 16) if len(parts) > 1 else None
+    except ValueError:
+        fp = None
+    return parts[0], fp
+
+
+def notion_headers(token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Notion-Version": NOTION_VERSION,
+        "Content-Type": "application/json"
+    }
+
+
+def dashed_database_id(database_id: str) -> str:
+    # Ensure ID has dashes for the URL
+    try:
+        return str(uuid.UUID(database_id))
+    except ValueError:
+        return database_id
+
+
+def _call(service, fn, *args, **kwargs):
+    # `service` is a ratelimit.RateLimitedService (optional).
+    if service is None:
+        return fn(*args, **kwargs)
+    return service.call(fn, *args, **kwargs)
+
+
+def notion_page_by_url(token: str, database_id: str, url: str, service=None, http=None) -> dict | None:
+    """The page of the database whose URL is `url` (normalized or as given), or None.
+
+    Asks Notion directly, so it also sees pages the index does not know yet.
+    Errors are raised: a failed lookup is not a page that does not exist.
+    """
+    if not database_id or not url:
+        return None
+
+    # Use raw requests because notion-client is broken in this environment
+    http = http or shared_pool().http
+    headers = notion_headers(token)
+    api_url = f"{NOTION_API_BASE}/databases/{dashed_database_id(database_id)}/query"
+
+    # Check the normalized URL, then the raw one if different
+    for candidate in dict.fromkeys((normalize_url(url), url)):
+        resp = _call(
+            service,
+            http.post,
+            api_url,
+            headers=headers,
+            json={
+                "filter": {"property": "URL", "url": {"equals": candidate}},
+                "page_size": 1,
+            },
+            timeout=10
+        )
+        resp.raise_for_status()
+        results = resp.json().get("results")
+        if results:
+            return results[0]
+    return None
+
+
+def notion_page_exists_by_url(token: str, database_id: str, url: str, service=None, http=None) -> bool:
+    try:
+        return notion_page_by_url(token, database_id, url, service=service, http=http) is not None
+    except Exception as exc:
+        logger.warning(f"Notion check error: {exc}")
+        return False
+
+
+class NotionUrlIndex:
+    """In-memory set of the database's URLs, loaded once per run.
+
+    Both the raw and the normalized form of every URL are kept so that
+    `exists` matches the same way the per-URL queries did. With a `store`
+    (see state_store.StateStore) only pages edited since the last sync are
+    fetched and the rest come from disk. If the prefetch fails, lookups fall
+    back to `notion_page_exists_by_url`. Requests go through `service`
+    (ratelimit.RateLimitedService) when given, over `http` (an httpx client,
+    the shared http_pool by default). With a `snapshot`
+    (snapshot.KnowledgeSnapshot) synced pages are fetched with all their
+    properties and handed to it.
+
+    When the database has a FINGERPRINT_PROPERTY column, `fingerprints` is
+    set after the prefetch: synced pages' content hashes go to the store and
+    their SimHash fingerprints to `near_dups` (near_dup.NearDuplicateIndex),
+    so content written by other shards is recognized, and `write_stage`
+    fills the column in.
+    """
+
+    def __init__(
+        self, token: str, database_id: str, store=None, service=None, page_size: int = 100, http=None, snapshot=None,
+        near_dups=None,
+    ):
+        self.token = token
+        self.database_id = database_id
+        self.store = store
+        self.service = service
+        self.page_size = page_size
+        self.http = http or shared_pool().http
+        self.snapshot = snapshot
+        self.near_dups = near_dups
+        self.fingerprints = False
+        self.loaded = False
+        self._urls: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def _property_ids(self, headers: dict) -> list[str]:
+        # Only ask for the URL (and fingerprint) columns while paging; page
+        # payloads are much smaller without Title/Summary rich_text.
+        resp = _call(
+            self.service,
+            self.http.get,
+            f"{NOTION_API_BASE}/databases/{dashed_database_id(self.database_id)}",
+            headers=headers,
+            timeout=10
+        )
+        resp.raise_for_status()
+        properties = resp.json().get("properties", {})
+        fingerprint = properties.get(FINGERPRINT_PROPERTY) or {}
+        self.fingerprints = fingerprint.get("type") == "rich_text"
+        names = ("URL", FINGERPRINT_PROPERTY) if self.fingerprints else ("URL",)
+        return [properties[name]["id"] for name in names if (properties.get(name) or {}).get("id")]
+
+    def _iter_pages(self, headers: dict, since: str | None = None):
+        api_url = f"{NOTION_API_BASE}/databases/{dashed_database_id(self.database_id)}/query"
+        params = {}
+        prop_ids = self._property_ids(headers)
+        # The snapshot needs Title / Summary / Published as well.
+        if prop_ids and self.snapshot is None:
+            params["filter_properties"] = prop_ids
+
+        base_body = {"page_size": self.page_size}
+        if since:
+            base_body["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}}
+            base_body["sorts"] = [{"timestamp": "last_edited_time", "direction": "ascending"}]
+
+        cursor = None
+        while True:
+            body = dict(base_body)
+            if cursor:
+                body["start_cursor"] = cursor
+            resp = _call(self.service, self.http.post, api_url, headers=headers, params=params, json=body, timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+
+            yield from data.get("results", [])
+
+            cursor = data.get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                break
+
+    def prefetch(self, full: bool = False) -> bool:
+        headers = notion_headers(self.token)
+        started = time.monotonic()
+        store = self.store
+        snapshot = self.snapshot
+
+        since = None
+        if store is not None:
+            if snapshot is not None and snapshot.needs_full_sync(self.database_id):
+                full = True
+            if full or store.get_meta(SYNC_DATABASE_KEY) != self.database_id:
+                store.clear_pages()
+                store.set_meta(SYNC_CURSOR_KEY, None)
+                if snapshot is not None:
+                    snapshot.clear()
+            since = store.get_meta(SYNC_CURSOR_KEY)
+
+        urls: set[str] = set()
+        pages = 0
+        newest = since
+        try:
+            for page in self._iter_pages(headers, since):
+                pages += 1
+                url = (page.get("properties", {}).get("URL") or {}).get("url")
+                if url:
+                    urls.add(url)
+                    urls.add(normalize_url(url))
+                edited = page.get("last_edited_time")
+                digest, fp = parse_fingerprint(page) if self.fingerprints else (None, None)
+                if store is not None and page.get("id"):
+                    store.upsert_page(page["id"], url, content_hash=digest, last_edited_time=edited)
+                if self.near_dups is not None and url and fp is not None:
+                    self.near_dups.add(normalize_url(url), fp)
+                if snapshot is not None:
+                    snapshot.upsert_page(page)
+                # ISO-8601 UTC timestamps compare correctly as strings.
+                if edited and (newest is None or edited > newest):
+                    newest = edited
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.warning(f"URL index prefetch failed, falling back to per-URL queries: {exc}")
+            if store is not None:
+                # Whatever is on disk is still known to exist; only misses go to Notion.
+                for url in store.iter_urls():
+                    self.add(url)
+            self.loaded = False
+            return False
+
+        if store is not None:
+            # Only advance the cursor once the whole delta is on disk.
+            store.set_meta(SYNC_DATABASE_KEY, self.database_id)
+            store.set_meta(SYNC_CURSOR_KEY, newest)
+            if snapshot is not None:
+                snapshot.mark_synced(self.database_id)
+            for url in store.iter_urls():
+                urls.add(url)
+                urls.add(normalize_url(url))
+
+        self._urls = urls
+        self.loaded = True
+        if store is not None:
+            mode = "incremental" if since else "full"
+            logger.info(
+                f"URL index: {pages} pages synced ({mode}) in {time.monotonic() - started:.1f}s, "
+                f"{store.page_count()} pages known locally"
+            )
+        else:
+            logger.info(f"URL index: {pages} pages prefetched in {time.monotonic() - started:.1f}s")
+        return True
+
+    def fingerprint_exists(self, digest: str) -> bool:
+        """Whether a page with this content hash is in the database (written by any shard)."""
+        if not self.fingerprints or not digest:
+            return False
+        try:
+            resp = _call(
+                self.service,
+                self.http.post,
+                f"{NOTION_API_BASE}/databases/{dashed_database_id(self.database_id)}/query",
+                headers=notion_headers(self.token),
+                json={"filter": {"property": FINGERPRINT_PROPERTY, "rich_text": {"starts_with": digest}}, "page_size": 1},
+                timeout=10,
+            )
+            return resp.status_code == 200 and bool(resp.json().get("results"))
+        except Exception as exc:
+            logger.warning(f"Notion fingerprint check error: {exc}")
+            return False
+
+    def exists(self, url: str) -> bool:
+        if not url:
+            return False
+        if url in self._urls or normalize_url(url) in self._urls:
+            return True
+        if not self.loaded:
+            return notion_page_exists_by_url(self.token, self.database_id, url, service=self.service, http=self.http)
+        return False
+
+    def add(self, url: str, page_id: str | None = None, content_hash: str | None = None) -> None:
+        # Keep the index (and the local store, when we know the page) current
+        # with pages created during this run.
+        if not url:
+            return
+        self._urls.add(url)
+        self._urls.add(normalize_url(url))
+        if self.store is not None and page_id:
+            self.store.upsert_page(page_id, url, content_hash=content_hash)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Article:
+    title: str
+    link: str
+    feed_url: str
+    entry: Any = None
+    published: str | None = None
+    raw_html: str = ""
+    text: str = ""
+    digest: str | None = None
+    simhash: int | None = None
+    summary: str | None = None
+    page_id: str | None = None
+    # Last stage finished by an earlier run (see run_journal), if resumed.
+    resumed: str | None = None
+
+
+@dataclass
+class Stage:
+    """One step of the pipeline.
+
+    `func` is a blocking function run on a worker thread. It returns the item
+    to hand to the next stage, or None when the item is finished here (e.g.
+    skipped as a duplicate). Exceptions mark the item as failed.
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    concurrency: int = 1
+
+
+@dataclass
+class PipelineResult:
+    completed: int = 0
+    dropped: Counter = field(default_factory=Counter)
+    failed: list = field(default_factory=list)
+    # Seconds spent in each stage's function. Histograms rather than one value
+    # per item, so a run over millions of entries keeps the same footprint.
+    timings: dict = field(default_factory=lambda: defaultdict(Histogram))
+
+    def stage_stats(self) -> dict:
+        return {
+            name: {
+                "count": histogram.count,
+                "total": histogram.sum,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "max": histogram.max,
+            }
+            for name, histogram in self.timings.items()
+        }
+
+
+async def run_stages(
+    items: Iterable,
+    stages: list[Stage],
+    queue_size: int = 8,
+    on_error: Callable[[Any, str, Exception], None] | None = None,
+) -> PipelineResult:
+    """Push `items` through `stages` connected by bounded queues.
+
+    Every stage runs `concurrency` workers, so different items are in
+    different stages at the same time. A full queue blocks the stage in
+    front of it, which keeps memory bounded when a later stage (typically
+    the Notion write) is the slowest. `items` may be a generator; it is
+    advanced only as the first queue has room. If it raises, the items
+    already queued still go through and the error is raised at the end.
+    """
+    result = PipelineResult()
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(
+        max_workers=sum(max(1, s.concurrency) for s in stages),
+        thread_name_prefix="pipeline",
+    )
+
+    async def source() -> None:
+        if isinstance(items, (list, tuple)):
+            for item in items:
+                await queues[0].put(item)
+            return
+        # A generator may block (reading a file, a download): advance it off the event loop.
+        iterator = iter(items)
+        while (item := await loop.run_in_executor(None, next, iterator, _DONE)) is not _DONE:
+            await queues[0].put(item)
+
+    timings_lock = threading.Lock()
+
+    def timed(stage: Stage, item):
+        started = time.perf_counter()
+        try:
+            return stage.func(item)
+        finally:
+            elapsed = time.perf_counter() - started
+            with timings_lock:
+                result.timings[stage.name].observe(elapsed)
+
+    async def worker(index: int, stage: Stage) -> None:
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            try:
+                out = await loop.run_in_executor(executor, timed, stage, item)
+            except Exception as exc:
+                result.failed.append((item, stage.name, exc))
+                if on_error is not None:
+                    on_error(item, stage.name, exc)
+                else:
+                    logger.error(f"Stage '{stage.name}' failed: {exc}")
+                continue
+            if out is None:
+                result.dropped[stage.name] += 1
+            elif outbox is not None:
+                await outbox.put(out)
+            else:
+                result.completed += 1
+
+    async def close(index: int, upstream) -> None:
+        # Once everything upstream has finished, tell each worker of this stage to stop.
+        # Also when `items` raised: the stages drain what they have and the error is
+        # raised from run_stages at the end instead of leaving the workers waiting.
+        try:
+            await upstream
+        finally:
+            for _ in range(max(1, stages[index].concurrency)):
+                await queues[index].put(_DONE)
+
+    tasks = []
+    upstream = asyncio.ensure_future(source())
+    try:
+        for index, stage in enumerate(stages):
+            tasks.append(asyncio.ensure_future(close(index, upstream)))
+            workers = [asyncio.ensure_future(worker(index, stage)) for _ in range(max(1, stage.concurrency))]
+            tasks.extend(workers)
+            upstream = asyncio.gather(*workers)
+        await upstream
+        await asyncio.gather(*tasks)
+    finally:
+        executor.shutdown(wait=True)
+    return result
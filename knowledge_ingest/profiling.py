@@ -0,0 +1,105 @@
+"""Profilers for `replay`: cProfile over every thread and a wall-clock stack sampler.
+
+The pipeline runs its stages on thread pools, so a profiler that only sees
+the main thread would show little more than the event loop waiting.
+Worker processes (EXTRACT_PROCESSES) are not profiled by either.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_WORKER_SUFFIX_RE = re.compile(r"_\d+$")
+
+
+@contextmanager
+def thread_profile(path: str, top: int = 20):
+    """cProfile everything run in the block, on any thread, into `path` (pstats format).
+
+    From Python 3.12 one profiler sees every thread; before that, each thread
+    started in the block gets its own profiler (threading.setprofile) and
+    their stats are added up at the end. The `top` functions by own time are
+    printed.
+    """
+    main = cProfile.Profile()
+    profiles = []
+    lock = threading.Lock()
+    per_thread = sys.version_info < (3, 12)
+
+    def start(frame, event, arg):
+        # First event of a new thread: hand it over to a profiler of its own.
+        profile = cProfile.Profile()
+        with lock:
+            profiles.append(profile)
+        profile.enable()
+
+    if per_thread:
+        threading.setprofile(start)
+    main.enable()
+    try:
+        yield
+    finally:
+        main.disable()
+        if per_thread:
+            threading.setprofile(None)
+        stats = pstats.Stats(main)
+        with lock:
+            for profile in profiles:
+                stats.add(profile)
+        stats.dump_stats(path)
+        logger.info(f"cProfile: stats of {len(profiles) + 1} threads written to {path} (python -m pstats {path})")
+        stats.sort_stats("tottime").print_stats(top)
+
+
+class StackSampler:
+    """Wall-clock sampling profiler: the stack of every thread every `interval` seconds.
+
+    Cheap enough to leave on for a whole run. `write` saves the samples in
+    the folded format of flamegraph.pl / speedscope (`thread;outer;...;inner
+    count`), with pool workers of the same pool merged into one thread name.
+    Threads waiting (on a queue, a socket, a lock) are sampled as well, so the
+    flame graph shows where time goes, not only where the CPU is busy.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(_WORKER_SUFFIX_RE.sub("", names.get(ident, str(ident))))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Sampler: {sum(self.samples.values())} samples every {self.interval * 1000:g} ms written to {path}")
@@ -0,0 +1,274 @@
+import logging
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def transient_errors() -> tuple:
+    """Connection-level failures worth retrying, from whichever HTTP stacks are loaded.
+
+    Looked up when an exception is caught rather than at import: a library's
+    errors can only be raised once it has been imported, and importing the
+    SDKs here would make every command pay for them.
+    """
+    errors = [TimeoutError, ConnectionError]
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        errors += [requests.ConnectionError, requests.Timeout]
+    httpx = sys.modules.get("httpx")
+    if httpx is not None:
+        errors.append(httpx.TransportError)
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        errors.append(openai.APIConnectionError)
+    notion_errors = sys.modules.get("notion_client.errors")
+    if notion_errors is not None:
+        errors.append(notion_errors.RequestTimeoutError)
+    return tuple(errors)
+
+
+def sent_nothing(exc: BaseException) -> bool:
+    """Whether a transport error happened before the request was sent.
+
+    Only then is a request that must not take effect twice safe to repeat:
+    after a read timeout or a dropped connection the server may have acted on it.
+    """
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(exc, requests.ConnectTimeout):
+        return True
+    return isinstance(exc, ConnectionRefusedError)
+
+
+def parse_retry_after(headers) -> float | None:
+    """Seconds to wait according to `Retry-After` (seconds or HTTP date).
+
+    OpenAI also sends the more precise `retry-after-ms`.
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(outcome) -> tuple[int | None, float | None]:
+    """Return (HTTP status, Retry-After seconds) for a response or an exception.
+
+    Works with requests/httpx responses and with the errors raised by
+    requests, openai and notion-client, which all expose the status and
+    headers under slightly different names.
+    """
+    response = getattr(outcome, "response", None)
+    status = getattr(outcome, "status_code", None) or getattr(outcome, "status", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    headers = getattr(outcome, "headers", None)
+    if headers is None and response is not None:
+        headers = getattr(response, "headers", None)
+    return (status if isinstance(status, int) else None), parse_retry_after(headers)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the time spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._blocked_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = max(self._blocked_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        # A 429 means the server-side budget is spent for every caller, not just this one.
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class RetryBudget:
+    """Upper bound on retries across the whole run, so an outage fails fast."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.used >= self.total:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.total - self.used)
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    # A longer Retry-After than this is treated as an outage, not throttling.
+    max_retry_after: float = 120.0
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter" exponential backoff.
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RateLimitedService:
+    """Calls to one remote service, paced by a token bucket and retried on 429/5xx.
+
+    `call` accepts functions that raise on HTTP errors (the SDK clients) as
+    well as functions that return a response object (requests/httpx); in the
+    latter case a retryable status is retried and the last response is
+    returned as-is once retries run out.
+    """
+
+    def __init__(self, name: str, bucket: TokenBucket, budget: RetryBudget, policy: RetryPolicy | None = None):
+        self.name = name
+        self.bucket = bucket
+        self.budget = budget
+        self.policy = policy or RetryPolicy()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _should_retry(self, attempt: int, status: int | None, retry_after: float | None = None) -> bool:
+        if attempt + 1 >= self.policy.max_attempts:
+            return False
+        if retry_after is not None and retry_after > self.policy.max_retry_after:
+            logger.warning(f"{self.name}: Retry-After {retry_after:.0f}s is too long, giving up on HTTP {status}")
+            return False
+        if not self.budget.take():
+            logger.warning(f"{self.name}: retry budget exhausted, giving up on HTTP {status}")
+            return False
+        return True
+
+    def _wait(self, attempt: int, status: int | None, retry_after: float | None, reason: str) -> None:
+        delay = retry_after if retry_after is not None else self.policy.backoff(attempt)
+        with self._lock:
+            self.retries += 1
+            if status == 429:
+                self.throttled += 1
+        if status == 429:
+            self.bucket.pause(delay)
+        logger.info(f"{self.name}: {reason}, retrying in {delay:.1f}s (attempt {attempt + 2}/{self.policy.max_attempts})")
+        time.sleep(delay)
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self._lock:
+                self.calls += 1
+            try:
+                result = fn(*args, **kwargs)
+            except transient_errors() as exc:
+                if not self._should_retry(attempt, None):
+                    raise
+                self._wait(attempt, None, None, f"{type(exc).__name__}")
+                attempt += 1
+                continue
+            except Exception as exc:
+                status, retry_after = classify(exc)
+                if status not in RETRYABLE_STATUS or not self._should_retry(attempt, status, retry_after):
+                    raise
+                self._wait(attempt, status, retry_after, f"HTTP {status}")
+                attempt += 1
+                continue
+
+            status, retry_after = classify(result)
+            if status in RETRYABLE_STATUS and self._should_retry(attempt, status, retry_after):
+                self._wait(attempt, status, retry_after, f"HTTP {status}")
+                attempt += 1
+                continue
+            return result
+
+    def call_once(self, fn, *args, find_existing=None, **kwargs):
+        """`call` for a request that must not take effect twice, such as creating a page.
+
+        `fn` must raise on HTTP errors (the SDK clients). It is sent again
+        without asking only when the server cannot have acted on it: a 429,
+        or a connection that failed before the request was sent. After any
+        other retryable failure (a timeout, 5xx, 408/409) the first attempt
+        may have gone through, so `find_existing()` is asked before sending
+        again and whatever it finds (not None) is returned instead. Without
+        `find_existing`, or when the lookup fails, those failures are raised.
+        """
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self._lock:
+                self.calls += 1
+            try:
+                return fn(*args, **kwargs)
+            except transient_errors() as exc:
+                error, status, retry_after = exc, None, None
+                reason, unsent = type(exc).__name__, sent_nothing(exc)
+            except Exception as exc:
+                status, retry_after = classify(exc)
+                if status not in RETRYABLE_STATUS:
+                    raise
+                error, reason, unsent = exc, f"HTTP {status}", status == 429
+            if not unsent and find_existing is None:
+                raise error
+            if not self._should_retry(attempt, status, retry_after):
+                raise error
+            # Waiting first also gives a request still in flight time to land.
+            self._wait(attempt, status, retry_after, reason)
+            if not unsent:
+                try:
+                    existing = find_existing()
+                except Exception as exc:
+                    logger.warning(f"{self.name}: cannot tell whether the request went through ({exc}), giving up")
+                    raise error
+                if existing is not None:
+                    logger.info(f"{self.name}: the request went through despite the {reason}, not sending it again")
+                    return existing
+            attempt += 1
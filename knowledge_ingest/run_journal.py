@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+
+from .urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Stages in the order an entry goes through them.
+FETCHED = "fetched"
+EXTRACTED = "extracted"
+SUMMARIZED = "summarized"
+WRITING = "writing"
+WRITTEN = "written"
+# Handed over to the Batch API ledger (batch_summarize), which resumes it itself.
+BATCHED = "batched"
+# Entries a later run continues from the last stage they finished.
+RESUMABLE = (EXTRACTED, SUMMARIZED, WRITING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT,
+    recorded_at REAL
+);
+CREATE INDEX IF NOT EXISTS journal_key ON journal(key, seq);
+"""
+# Keys whose latest record is a resumable stage.
+_RESUMABLE_KEYS = (
+    "SELECT j.key FROM journal j "
+    "JOIN (SELECT key, MAX(seq) AS last FROM journal GROUP BY key) l ON l.last = j.seq "
+    f"WHERE j.stage IN ({', '.join(repr(s) for s in RESUMABLE)})"
+)
+
+
+def journal_key(link: str) -> str:
+    return normalize_url(link)
+
+
+class RunJournal:
+    """Append-only record of how far each entry got, in the state database.
+
+    Every stage an entry finishes is appended as its own row (committed
+    before the next stage starts), together with whatever a later run needs
+    to continue from there: the extracted text after `extracted`, the
+    summary after `summarized`, the Notion page ID after `written`. A page
+    whose last record is `writing` may or may not have been created, so it
+    must be checked against Notion before writing it again.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        store.executescript(SCHEMA)
+
+    def record(self, link: str, stage: str, /, **data) -> None:
+        self.store.execute(
+            "INSERT INTO journal (key, stage, data, recorded_at) VALUES (?, ?, ?, ?)",
+            (journal_key(link), stage, json.dumps(data, ensure_ascii=False) if data else None, time.time()),
+        )
+
+    def resumable(self) -> list[dict]:
+        """Unfinished entries whose last stage is in RESUMABLE, oldest first.
+
+        Each dict merges the data of all records of the entry and has the
+        last stage under "stage".
+        """
+        rows = self.store.execute(f"SELECT key, stage, data FROM journal WHERE key IN ({_RESUMABLE_KEYS}) ORDER BY seq")
+        entries: dict[str, dict] = {}
+        for key, stage, data in rows:
+            entry = entries.setdefault(key, {"key": key})
+            if data:
+                entry.update(json.loads(data))
+            entry["stage"] = stage
+        return list(entries.values())
+
+    def compact(self) -> int:
+        """Drop the records of entries that are not resumable; returns the rows removed.
+
+        Run at the end of a run: finished entries are known to the URL
+        index, and entries that never got past `fetched` start over anyway.
+        """
+        with self.store.transaction() as conn:
+            removed = conn.execute(f"DELETE FROM journal WHERE key NOT IN ({_RESUMABLE_KEYS})").rowcount
+        if removed:
+            logger.debug(f"Journal: compacted {removed} records")
+        return removed
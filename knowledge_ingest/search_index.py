@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+
+from .near_dup import tokenize
+
+DEFAULT_SEARCH_PATH = os.path.join(os.path.dirname(__file__), "..", ".cache", "search_index.sqlite3")
+# bm25() weights of the title, summary and body columns.
+WEIGHTS = (5.0, 2.0, 1.0)
+
+# The FTS table is contentless: it holds only the index, not a second copy of
+# every article text. Japanese is indexed as character bigrams (near_dup.tokenize),
+# which the unicode61 tokenizer then sees as ordinary words.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    page_id TEXT UNIQUE,
+    url TEXT,
+    title TEXT,
+    published TEXT,
+    summary TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS docs_published ON docs(published);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    title, summary, body, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def index_terms(text: str) -> str:
+    return " ".join(tokenize(text or ""))
+
+
+def match_expression(query: str) -> str:
+    """FTS5 query for `query`: every whitespace-separated term must match.
+
+    A term becomes a phrase of its tokens, so a Japanese word matches its
+    consecutive bigrams; a single character or a term ending in `*` is a
+    prefix query.
+    """
+    phrases = []
+    for term in query.split():
+        prefix = term.endswith("*")
+        tokens = tokenize(term.rstrip("*"))
+        if not tokens:
+            continue
+        phrase = '"' + " ".join(tokens) + '"'
+        if prefix or (len(tokens) == 1 and len(tokens[0]) == 1):
+            phrase += "*"
+        phrases.append(phrase)
+    return " AND ".join(phrases)
+
+
+class SearchIndex:
+    """Full-text index (SQLite FTS5) over the titles, texts and summaries of written pages.
+
+    Lives in its own database file next to the state database: article
+    texts are large and nothing else in a run needs them. Pages are added
+    as they are written; a page already in the index is left as it is.
+    """
+
+    def __init__(self, path: str = DEFAULT_SEARCH_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def add(self, page_id: str, url: str, title: str, published: str | None, summary: str | None, text: str = "") -> bool:
+        """Index one page; returns False if it was indexed before."""
+        if not page_id:
+            return False
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO docs (page_id, url, title, published, summary, indexed_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(page_id) DO NOTHING",
+                (page_id, url, title, published, summary, time.time()),
+            )
+            if not cursor.rowcount:
+                return False
+            self.conn.execute(
+                "INSERT INTO docs_fts (rowid, title, summary, body) VALUES (?, ?, ?, ?)",
+                (cursor.lastrowid, index_terms(title), index_terms(summary), index_terms(text)),
+            )
+        return True
+
+    def search(
+        self, query: str, since: str | None = None, until: str | None = None, limit: int = 20, order: str = "rank"
+    ) -> list[dict]:
+        """Best matches for `query` (bm25, title > summary > body), optionally within a publish date range.
+
+        `since` / `until` are ISO dates (YYYY-MM-DD, inclusive); `order="date"`
+        sorts the matches newest first instead of by rank.
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            "SELECT d.page_id, d.url, d.title, d.published, d.summary, bm25(docs_fts, ?, ?, ?) AS score "
+            "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?"
+        )
+        params = [*WEIGHTS, expression]
+        if since:
+            sql += " AND d.published >= ?"
+            params.append(since)
+        if until:
+            # Published values may carry a time; anything on `until` itself is included.
+            sql += " AND d.published < ?"
+            params.append(until + "\uffff")
+        sql += " ORDER BY d.published DESC" if order == "date" else " ORDER BY score"
+        sql += " LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        keys = ("page_id", "url", "title", "published", "summary", "score")
+        return [dict(zip(keys, row)) for row in rows]
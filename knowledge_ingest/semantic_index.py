@@ -0,0 +1,308 @@
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+from .near_dup import tokenize
+
+logger = logging.getLogger(__name__)
+
+MODEL_META_KEY = "embedding_model"
+# Rows scored per matrix product, so a search never holds more than this many scores.
+BLOCK_ROWS = 65536
+# IVF: rows used to train the centroids, k-means rounds, and how much of the
+# matrix may sit outside the IVF lists (appended since the last build).
+IVF_SAMPLE_ROWS = 20000
+IVF_ITERATIONS = 10
+IVF_MAX_TAIL = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    row INTEGER PRIMARY KEY,
+    page_id TEXT UNIQUE,
+    url TEXT,
+    title TEXT
+);
+CREATE INDEX IF NOT EXISTS embeddings_url ON embeddings(url);
+"""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class HashingEmbedder:
+    """Deterministic local embedding: signed feature hashing of tokens and token pairs.
+
+    Needs no network or model download; texts sharing words (or, for
+    Japanese, character bigrams) end up close. Meant for offline runs and
+    tests, not as a substitute for a trained model.
+    """
+
+    name = "local"
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _slot(self, feature: str) -> tuple[int, float]:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        return h % self.dimensions, 1.0 if h >> 63 else -1.0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                slot, sign = self._slot(feature)
+                vectors[row, slot] += sign
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings, one request per batch of texts.
+
+    `client` is a callable returning the OpenAI SDK client, so the SDK is
+    only loaded once something is embedded. Requests go through `service`
+    (ratelimit.RateLimitedService) when given.
+    """
+
+    def __init__(self, client, model: str = "text-embedding-3-small", dimensions: int = 256, service=None):
+        self.client = client
+        self.model = model
+        self.name = model
+        self.dimensions = dimensions
+        self.service = service
+        self.tokens = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        create = self.client().embeddings.create
+        kwargs = {"model": self.model, "input": texts, "dimensions": self.dimensions}
+        res = self.service.call(create, **kwargs) if self.service is not None else create(**kwargs)
+        if res.usage is not None:
+            self.tokens += res.usage.total_tokens
+        ordered = sorted(res.data, key=lambda item: item.index)
+        return _normalize(np.asarray([item.embedding for item in ordered], dtype=np.float32))
+
+
+class SemanticIndex:
+    """Unit-length float32 embeddings of the written pages in a memory-mapped file.
+
+    Row i of the matrix at `path` belongs to the row i entry of the
+    `embeddings` table in the state database (state_store.StateStore),
+    which maps it to the page ID, URL and title. Searches multiply the
+    memory-mapped matrix block by block, so memory stays flat no matter
+    how many rows there are. With an IVF index (`build_ivf`, kept next to
+    the matrix) only the lists closest to the query are scored.
+
+    Pages are queued with `queue` and embedded `batch_size` at a time;
+    `flush` embeds whatever is left.
+    """
+
+    def __init__(self, store, path: str, embedder, batch_size: int = 64):
+        self.store = store
+        self.path = path
+        self.ivf_path = f"{path}.ivf.npz"
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self.batch_size = batch_size
+        self.embedded = 0
+        self._pending: list[tuple[str, str, str, str]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._ivf = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        store.executescript(SCHEMA)
+        model = f"{embedder.name}:{self.dimensions}"
+        if store.get_meta(MODEL_META_KEY) != model:
+            self._reset(model)
+        self._repair()
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dimensions * 4
+
+    def _reset(self, model: str) -> None:
+        # Vectors of another model / size are not comparable; start over.
+        if self.store.execute("SELECT 1 FROM embeddings LIMIT 1"):
+            logger.info(f"Semantic index: embedding model changed to {model}, dropping the old vectors")
+        self.store.execute("DELETE FROM embeddings")
+        for path in (self.path, self.ivf_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.store.set_meta(MODEL_META_KEY, model)
+
+    def _repair(self) -> None:
+        # A crash between appending vectors and recording their rows leaves the two out of step.
+        rows = self.store.execute("SELECT COUNT(*) FROM embeddings")[0][0]
+        stored = os.path.getsize(self.path) // self.row_bytes if os.path.exists(self.path) else 0
+        if stored > rows:
+            with open(self.path, "r+b") as f:
+                f.truncate(rows * self.row_bytes)
+        elif stored < rows:
+            self.store.execute("DELETE FROM embeddings WHERE row >= ?", (stored,))
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.path) // self.row_bytes if os.path.exists(self.path) else 0
+
+    def _matrix(self) -> np.ndarray | None:
+        rows = len(self)
+        if not rows:
+            return None
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dimensions))
+
+    def queue(self, page_id: str, url: str, title: str, text: str) -> None:
+        if not page_id:
+            return
+        with self._lock:
+            self._pending.append((page_id, url, title, text))
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self.add(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self.add(batch)
+
+    def add(self, items: list[tuple[str, str, str, str]]) -> int:
+        """Embed and append (page ID, URL, title, text) items; pages already indexed are skipped."""
+        known = {
+            page_id for (page_id,) in self.store.execute(
+                f"SELECT page_id FROM embeddings WHERE page_id IN ({', '.join('?' * len(items))})",
+                [item[0] for item in items],
+            )
+        } if items else set()
+        items = [item for item in items if item[0] not in known]
+        if not items:
+            return 0
+        vectors = self.embedder.embed([text for _, _, _, text in items])
+        with self._write_lock:
+            start = len(self)
+            with open(self.path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            self.store.executemany(
+                "INSERT INTO embeddings (row, page_id, url, title) VALUES (?, ?, ?, ?)",
+                [(start + i, page_id, url, title) for i, (page_id, url, title, _) in enumerate(items)],
+            )
+        self.embedded += len(items)
+        return len(items)
+
+    def row_of(self, key: str) -> int | None:
+        """Row of a page, by page ID or URL."""
+        rows = self.store.execute("SELECT row FROM embeddings WHERE page_id = ? OR url = ? LIMIT 1", (key, key))
+        return rows[0][0] if rows else None
+
+    def _load_ivf(self):
+        if self._ivf is None and os.path.exists(self.ivf_path):
+            with np.load(self.ivf_path) as data:
+                self._ivf = (data["centroids"], data["assign"])
+        return self._ivf
+
+    def build_ivf(self, lists: int | None = None, seed: int = 0) -> int:
+        """Cluster the rows into `lists` (default ~sqrt(rows)) with spherical k-means.
+
+        Rows appended afterwards are scored exactly until the next build.
+        Returns the number of lists.
+        """
+        matrix = self._matrix()
+        if matrix is None:
+            return 0
+        rows = matrix.shape[0]
+        lists = max(1, min(rows, lists or int(np.sqrt(rows))))
+        rng = np.random.default_rng(seed)
+        sample = matrix[np.sort(rng.choice(rows, size=min(rows, IVF_SAMPLE_ROWS), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(lists):
+                members = sample[nearest == cluster]
+                # Empty clusters keep their centroid.
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+            centroids = _normalize(centroids).astype(np.float32)
+        assign = np.empty(rows, dtype=np.int32)
+        for start in range(0, rows, BLOCK_ROWS):
+            assign[start:start + BLOCK_ROWS] = np.argmax(matrix[start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+        tmp = f"{self.ivf_path}.tmp.npz"
+        np.savez(tmp, centroids=centroids, assign=assign)
+        os.replace(tmp, self.ivf_path)
+        self._ivf = (centroids, assign)
+        logger.info(f"Semantic index: built {lists} IVF lists over {rows} vectors")
+        return lists
+
+    def maybe_build_ivf(self, min_rows: int) -> bool:
+        """(Re)build the IVF lists once there are `min_rows` rows and too many are outside them."""
+        rows = len(self)
+        if not min_rows or rows < min_rows:
+            return False
+        ivf = self._load_ivf()
+        if ivf is not None and rows - len(ivf[1]) <= IVF_MAX_TAIL * len(ivf[1]):
+            return False
+        self.build_ivf()
+        return True
+
+    def _candidates(self, query: np.ndarray, rows: int, nprobe: int) -> np.ndarray | None:
+        ivf = self._load_ivf()
+        if ivf is None or not nprobe:
+            return None
+        centroids, assign = ivf
+        probes = np.argsort(-(centroids @ query))[:nprobe]
+        covered = np.flatnonzero(np.isin(assign, probes))
+        return np.concatenate([covered, np.arange(len(assign), rows)])
+
+    def search_vector(self, query: np.ndarray, k: int = 10, exclude: int | None = None, nprobe: int = 8) -> list[dict]:
+        """Top-k rows by cosine similarity to `query`; exact when `nprobe` is 0 or there is no IVF index."""
+        matrix = self._matrix()
+        if matrix is None:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        rows = matrix.shape[0]
+        candidates = self._candidates(query, rows, nprobe)
+        if candidates is not None:
+            ids = candidates[candidates != exclude] if exclude is not None else candidates
+            scores = matrix[ids] @ query
+        else:
+            ids_parts, score_parts = [], []
+            for start in range(0, rows, BLOCK_ROWS):
+                block = matrix[start:start + BLOCK_ROWS] @ query
+                if exclude is not None and start <= exclude < start + len(block):
+                    block[exclude - start] = -np.inf
+                top = np.argpartition(-block, min(k, len(block)) - 1)[:k]
+                ids_parts.append(top + start)
+                score_parts.append(block[top])
+            ids, scores = np.concatenate(ids_parts), np.concatenate(score_parts)
+        if not len(ids):
+            return []
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+        return self._describe(hits)
+
+    def _describe(self, hits: list[tuple[int, float]]) -> list[dict]:
+        if not hits:
+            return []
+        rows = {
+            row: (page_id, url, title) for row, page_id, url, title in self.store.execute(
+                f"SELECT row, page_id, url, title FROM embeddings WHERE row IN ({', '.join('?' * len(hits))})",
+                [row for row, _ in hits],
+            )
+        }
+        keys = ("page_id", "url", "title")
+        return [{**dict(zip(keys, rows[row])), "score": score} for row, score in hits if row in rows]
+
+    def search(self, text: str, k: int = 10, nprobe: int = 8) -> list[dict]:
+        """Pages closest in meaning to `text` (embedded with the index's embedder)."""
+        return self.search_vector(self.embedder.embed([text])[0], k=k, nprobe=nprobe)
+
+    def related(self, key: str, k: int = 5, nprobe: int = 8) -> list[dict]:
+        """Pages closest to the page with this page ID or URL (itself excluded)."""
+        row = self.row_of(key)
+        matrix = self._matrix()
+        if row is None or matrix is None:
+            return []
+        return self.search_vector(np.array(matrix[row]), k=k, exclude=row, nprobe=nprobe)
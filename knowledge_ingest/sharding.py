@@ -0,0 +1,34 @@
+import hashlib
+import os
+
+from .urls import normalize_url
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """(index, count) of an `i/N` shard spec; raises ValueError for anything else."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N (e.g. 0/4), got {value!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be in 0..{count - 1}, got {value!r}")
+    return index, count
+
+
+def shard_of(url: str, count: int) -> int:
+    """Shard (0..count-1) that owns `url`.
+
+    Stable across processes and Python versions (unlike hash()), and taken
+    from the normalized URL so tracking parameters don't move an article to
+    another shard.
+    """
+    if count <= 1:
+        return 0
+    digest = hashlib.sha1(normalize_url(url).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def shard_path(path: str, index: int, count: int) -> str:
+    # .cache/ingest_state.sqlite3 -> .cache/ingest_state.shard-0-of-4.sqlite3
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{ext}"
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from .metrics import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Bump when the line format changes; readers skip snapshots of a version they don't know.
+SNAPSHOT_VERSION = 1
+SYNCED_META_KEY = "snapshot_database_id"
+REVISION_META_KEY = "snapshot_revision"
+# Set once the stored `published` values have been rewritten by normalize_published.
+PUBLISHED_META_KEY = "snapshot_published_utc"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    page_id TEXT PRIMARY KEY,
+    title TEXT,
+    url TEXT,
+    published TEXT,
+    summary TEXT,
+    updated_at REAL
+);
+"""
+
+
+def _plain_text(prop: dict | None, kind: str) -> str:
+    return "".join(part.get("plain_text") or part.get("text", {}).get("content", "") for part in (prop or {}).get(kind) or [])
+
+
+def normalize_published(value: str | None) -> str | None:
+    """`published` as UTC ISO 8601 (`2024-05-01T00:00:00+00:00`), so values sort and compare as strings.
+
+    Pages written by older versions held naive local time and Notion returns
+    its own form (`2024-05-01T09:00:00.000+09:00`). Dates without a time are
+    kept as they are.
+    """
+    if not value or len(value) <= 10:
+        return value or None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    # A naive value is local time (astimezone assumes so).
+    return parsed.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def article_from_page(page: dict) -> dict:
+    """Title / URL / Published / Summary of a Notion database page."""
+    props = page.get("properties") or {}
+    return {
+        "id": page.get("id"),
+        "title": _plain_text(props.get("Title"), "title"),
+        "url": (props.get("URL") or {}).get("url"),
+        "published": normalize_published(((props.get("Published") or {}).get("date") or {}).get("start")),
+        "summary": _plain_text(props.get("Summary"), "rich_text"),
+    }
+
+
+class KnowledgeSnapshot:
+    """Every ingested article (title, URL, published, summary) for the site.
+
+    Rows live in the state database (state_store.StateStore) and are kept
+    current from two sides: pages written by the pipeline, and pages the
+    incremental Notion sync (notion_index.NotionUrlIndex) sees edited. `export`
+    rewrites the NDJSON file only when something changed: a header line
+    {"version", "revision", "generated_at", "count"} followed by one article
+    per line, newest first.
+    """
+
+    def __init__(self, store, path: str):
+        self.store = store
+        self.path = path
+        self.changed = 0
+        store.executescript(SCHEMA)
+        if store.get_meta(PUBLISHED_META_KEY) is None:
+            self._normalize_stored()
+
+    def _normalize_stored(self) -> None:
+        rows = self.store.execute("SELECT page_id, published FROM articles WHERE published IS NOT NULL")
+        updates = []
+        for page_id, published in rows:
+            normalized = normalize_published(published)
+            if normalized != published:
+                updates.append((normalized, page_id))
+        self.store.executemany("UPDATE articles SET published = ? WHERE page_id = ?", updates)
+        self.store.set_meta(PUBLISHED_META_KEY, "1")
+        if updates:
+            self.changed += 1
+
+    def needs_full_sync(self, database_id: str) -> bool:
+        # Pages ingested before the snapshot existed are only found by a full sync.
+        return self.store.get_meta(SYNCED_META_KEY) != database_id
+
+    def mark_synced(self, database_id: str) -> None:
+        self.store.set_meta(SYNCED_META_KEY, database_id)
+
+    def clear(self) -> None:
+        self.store.execute("DELETE FROM articles")
+        self.changed += 1
+
+    def upsert(self, article: dict) -> None:
+        if not article.get("id") or not article.get("url"):
+            return
+        changed = self.store.execute(
+            "INSERT INTO articles (page_id, title, url, published, summary, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(page_id) DO UPDATE SET title = excluded.title, url = excluded.url, "
+            "published = excluded.published, summary = excluded.summary, updated_at = excluded.updated_at "
+            "WHERE (articles.title, articles.url, articles.published, articles.summary) IS NOT "
+            "(excluded.title, excluded.url, excluded.published, excluded.summary) "
+            "RETURNING page_id",
+            (
+                article["id"], article["title"], article["url"], normalize_published(article["published"]),
+                article["summary"], time.time(),
+            ),
+        )
+        if changed:
+            self.changed += 1
+
+    def upsert_page(self, page: dict) -> None:
+        self.upsert(article_from_page(page))
+
+    def __len__(self) -> int:
+        return self.store.execute("SELECT COUNT(*) FROM articles")[0][0]
+
+    def export(self) -> bool:
+        """Write the snapshot file if anything changed (or it is missing); returns whether it was written."""
+        if not self.changed and os.path.exists(self.path):
+            return False
+        rows = self.store.execute(
+            "SELECT page_id, title, url, published, summary FROM articles "
+            "ORDER BY published IS NULL, published DESC, page_id"
+        )
+        revision = int(self.store.get_meta(REVISION_META_KEY) or 0) + 1
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "revision": revision,
+            "generated_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "count": len(rows),
+        }
+        lines = [json.dumps(header, ensure_ascii=False)]
+        keys = ("id", "title", "url", "published", "summary")
+        lines.extend(json.dumps(dict(zip(keys, row)), ensure_ascii=False) for row in rows)
+        write_atomic(self.path, "\n".join(lines) + "\n")
+        self.store.set_meta(REVISION_META_KEY, str(revision))
+        self.changed = 0
+        logger.info(f"Snapshot: {len(rows)} articles written to {self.path} (revision {revision})")
+        return True
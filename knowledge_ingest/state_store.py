@@ -0,0 +1,201 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .urls import normalize_url
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(__file__), "..", ".cache", "ingest_state.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    url TEXT,
+    normalized_url TEXT,
+    content_hash TEXT,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_url ON pages(url);
+CREATE INDEX IF NOT EXISTS pages_normalized_url ON pages(normalized_url);
+CREATE INDEX IF NOT EXISTS pages_content_hash ON pages(content_hash);
+CREATE TABLE IF NOT EXISTS feeds (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    modified TEXT,
+    last_status INTEGER,
+    last_fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS feed_entries (
+    feed_url TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    published REAL,
+    seen_at REAL,
+    PRIMARY KEY (feed_url, entry_id)
+);
+"""
+# Processed entry IDs are kept this far behind the feed's watermark.
+FEED_ENTRY_RETENTION = 90 * 24 * 3600
+
+
+def content_hash(text: str) -> str:
+    # Whitespace-insensitive so re-rendered copies of the same text collide.
+    normalized = re.sub(r"\s+", " ", text or "").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class StateStore:
+    """On-disk run state shared between runs (SQLite).
+
+    Holds the seen URLs / content hashes / Notion page IDs used for dedup,
+    the cursor of the last incremental sync against Notion, the HTTP
+    validators (ETag / Last-Modified) of every feed and the entries of each
+    feed that were already processed.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    # Generic access for modules that keep their own tables in this database.
+    def executescript(self, script: str) -> None:
+        with self._lock, self.conn:
+            self.conn.executescript(script)
+
+    def execute(self, sql: str, params=()) -> list:
+        with self._lock, self.conn:
+            return self.conn.execute(sql, params).fetchall()
+
+    def executemany(self, sql: str, seq) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(sql, seq)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock, self.conn:
+            yield self.conn
+
+    def get_meta(self, key: str) -> str | None:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str | None) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def upsert_page(
+        self,
+        page_id: str,
+        url: str | None,
+        content_hash: str | None = None,
+        last_edited_time: str | None = None,
+    ) -> None:
+        normalized = normalize_url(url) if url else None
+        with self._lock, self.conn:
+            # Notion sync does not know the content hash; keep the one we stored on write.
+            self.conn.execute(
+                "INSERT INTO pages (page_id, url, normalized_url, content_hash, last_edited_time) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(page_id) DO UPDATE SET "
+                "url = excluded.url, normalized_url = excluded.normalized_url, "
+                "content_hash = COALESCE(excluded.content_hash, pages.content_hash), "
+                "last_edited_time = COALESCE(excluded.last_edited_time, pages.last_edited_time)",
+                (page_id, url, normalized, content_hash, last_edited_time),
+            )
+
+    def has_url(self, url: str) -> bool:
+        if not url:
+            return False
+        normalized = normalize_url(url)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM pages WHERE url IN (?, ?) OR normalized_url IN (?, ?) LIMIT 1",
+                (url, normalized, url, normalized),
+            ).fetchone()
+        return row is not None
+
+    def has_content_hash(self, digest: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (digest,)
+            ).fetchone()
+        return row is not None
+
+    def iter_urls(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT url FROM pages WHERE url IS NOT NULL").fetchall()
+        for (url,) in rows:
+            yield url
+
+    def page_count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def clear_pages(self) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM pages")
+
+    def get_feed_validators(self, url: str) -> tuple[str | None, str | None]:
+        with self._lock:
+            row = self.conn.execute("SELECT etag, modified FROM feeds WHERE url = ?", (url,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save_feed_validators(self, url: str, etag: str | None, modified: str | None, status: int | None) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO feeds (url, etag, modified, last_status, last_fetched_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, modified = excluded.modified, "
+                "last_status = excluded.last_status, last_fetched_at = excluded.last_fetched_at",
+                (url, etag, modified, status, time.time()),
+            )
+
+    def get_feed_watermark(self, url: str) -> float | None:
+        """Newest publish time (epoch seconds) among the processed entries of a feed."""
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(published) FROM feed_entries WHERE feed_url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def seen_entry_ids(self, url: str) -> set[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT entry_id FROM feed_entries WHERE feed_url = ?", (url,)).fetchall()
+        return {entry_id for (entry_id,) in rows}
+
+    def mark_entries_seen(self, url: str, entries: list[tuple[str, float | None]]) -> None:
+        """Record (entry ID, publish time) pairs as processed and forget old ones."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO feed_entries (feed_url, entry_id, published, seen_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(feed_url, entry_id) DO UPDATE SET "
+                "published = COALESCE(excluded.published, feed_entries.published), seen_at = excluded.seen_at",
+                [(url, entry_id, published, now) for entry_id, published in entries],
+            )
+            watermark = self.conn.execute(
+                "SELECT MAX(published) FROM feed_entries WHERE feed_url = ?", (url,)
+            ).fetchone()[0]
+            # Entries this far behind the watermark are never selected again.
+            self.conn.execute(
+                "DELETE FROM feed_entries WHERE feed_url = ? AND COALESCE(published, seen_at) < ?",
+                (url, (watermark or now) - FEED_ENTRY_RETENTION),
+            )
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summary_cache (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at REAL,
+    last_used_at REAL
+);
+CREATE INDEX IF NOT EXISTS summary_cache_last_used ON summary_cache(last_used_at);
+"""
+
+
+def summary_cache_key(text: str, prompt_version: str, model: str, title: str = "") -> str:
+    # Without usable text the prompt asks the model to guess from the title,
+    # so the title is what identifies the summary.
+    normalized = re.sub(r"\s+", " ", text or "").strip()
+    source = normalized if len(normalized) > 50 else f"title:{title}"
+    raw = "\0".join((model, prompt_version, source))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """LLM summaries keyed by article text, prompt version and model.
+
+    Stored in the state database (state_store.StateStore). Once there are
+    more than `max_entries` rows, the least recently used ones are evicted.
+    """
+
+    def __init__(self, store, max_entries: int = 5000):
+        self.store = store
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        store.executescript(SCHEMA)
+        self._size = store.execute("SELECT COUNT(*) FROM summary_cache")[0][0]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> str | None:
+        rows = self.store.execute("SELECT summary FROM summary_cache WHERE key = ?", (key,))
+        with self._lock:
+            if rows:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not rows:
+            return None
+        self.store.execute("UPDATE summary_cache SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        return rows[0][0]
+
+    def put(self, key: str, summary: str) -> None:
+        if not summary:
+            return
+        now = time.time()
+        with self.store.transaction() as conn:
+            # rowcount of an upsert is 1 for an update too; only new rows grow the cache.
+            inserted = conn.execute(
+                "INSERT INTO summary_cache (key, summary, created_at, last_used_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO NOTHING",
+                (key, summary, now, now),
+            ).rowcount
+            if not inserted:
+                conn.execute(
+                    "UPDATE summary_cache SET summary = ?, last_used_at = ? WHERE key = ?", (summary, now, key)
+                )
+        with self._lock:
+            self._size += inserted
+            over = self._size > self.max_entries
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        with self.store.transaction() as conn:
+            removed = conn.execute(
+                "DELETE FROM summary_cache WHERE key IN ("
+                "SELECT key FROM summary_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            size = conn.execute("SELECT COUNT(*) FROM summary_cache").fetchone()[0]
+        with self._lock:
+            self._size = size
+        if removed:
+            logger.debug(f"Summary cache: evicted {removed} entries")
+        return removed
@@ -0,0 +1,94 @@
+"""Micro-benchmark: extract.extract_text vs. the BeautifulSoup strip_html path.
+
+Usage:
+    uv run python scripts/bench/bench_extract.py            # build corpus from feeds.json on first run
+    uv run python scripts/bench/bench_extract.py --refresh  # re-download the corpus
+    uv run python scripts/bench/bench_extract.py --corpus DIR --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from knowledge_ingest import extract  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+DEFAULT_CORPUS = os.path.join(ROOT, ".cache", "bench", "extract_corpus")
+
+
+def build_corpus(corpus_dir: str) -> int:
+    import feedparser
+
+    with open(os.path.join(ROOT, "feeds.json"), "r", encoding="utf-8") as f:
+        feeds = json.load(f)
+    os.makedirs(corpus_dir, exist_ok=True)
+    count = 0
+    for url in feeds:
+        feed = feedparser.parse(url)
+        for e in feed.entries:
+            html = e.content[0].value if "content" in e and e.content else e.get("summary", "")
+            if not html:
+                continue
+            with open(os.path.join(corpus_dir, f"{count:04d}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+            count += 1
+    return count
+
+
+def load_corpus(corpus_dir: str) -> list[str]:
+    docs = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(corpus_dir, name), "r", encoding="utf-8") as f:
+                docs.append(f.read())
+    return docs
+
+
+def bench(func, docs: list[str], repeat: int) -> list[float]:
+    per_doc = []
+    for html in docs:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func(html)
+        per_doc.append((time.perf_counter() - started) / repeat)
+    return per_doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--refresh", action="store_true", help="download the corpus again from feeds.json")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=6000)
+    args = parser.parse_args()
+
+    if args.refresh or not os.path.isdir(args.corpus) or not os.listdir(args.corpus):
+        print(f"Downloaded {build_corpus(args.corpus)} documents into {args.corpus}")
+    docs = load_corpus(args.corpus)
+    if not docs:
+        sys.exit("Corpus is empty")
+
+    candidates = [("bs4 strip_html", lambda h: extract.strip_html(h)[:args.limit])]
+    if extract._lxml_etree is not None:
+        candidates.append(("streaming lxml", lambda h: extract._extract_lxml(h, args.limit)))
+    candidates.append(("streaming html.parser", lambda h: extract._extract_stdlib(h, args.limit)))
+
+    total_kb = sum(len(d) for d in docs) / 1024
+    print(f"{len(docs)} documents, {total_kb:.0f} KiB, limit {args.limit} chars, repeat {args.repeat}")
+    print(f"{'engine':<24}{'total ms':>10}{'mean ms':>10}{'p95 ms':>10}{'speedup':>10}")
+    baseline = None
+    for name, func in candidates:
+        per_doc = bench(func, docs, args.repeat)
+        total = sum(per_doc)
+        baseline = baseline or total
+        p95 = statistics.quantiles(per_doc, n=20)[-1] if len(per_doc) > 1 else per_doc[0]
+        print(f"{name:<24}{total * 1000:>10.2f}{statistics.mean(per_doc) * 1000:>10.3f}{p95 * 1000:>10.3f}{baseline / total:>9.1f}x")
+    print(f"extract_text uses: {extract.ENGINE}")
+
+
+if __name__ == "__main__":
+    main()
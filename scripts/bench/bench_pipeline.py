@@ -0,0 +1,140 @@
+"""End-to-end benchmark of the ingest run against local fake services.
+
+Starts synthetic feeds and Notion / OpenAI stand-ins (fake_services.py),
+runs `python -m knowledge_ingest run` once per workload size in a fresh
+state directory, and reports entries/s, p50/p95 per pipeline stage and
+the peak RSS of the run.
+
+Usage:
+    uv run python scripts/bench/bench_pipeline.py                    # 10, 1k and 100k entries
+    uv run python scripts/bench/bench_pipeline.py --sizes 10 1000 --openai-latency 0.5
+    uv run python scripts/bench/bench_pipeline.py --sizes 1000 --json bench.json
+
+With the default 3 req/s Notion limit every written entry costs at least
+1/3 s, so the 100k workload runs for hours; pass --notion-rps to measure
+the rest of the pipeline at a higher limit. Other settings of the run
+(e.g. OPENAI_RPS, WRITE_CONCURRENCY) are taken from the environment.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_services import FakeServices  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+STAGES = ("fetch", "extract", "presummarize", "summarize", "write")
+
+
+def run_workload(size: int, args) -> dict:
+    services = FakeServices(
+        size,
+        entries_per_feed=args.entries_per_feed,
+        notion_rps=args.notion_rps,
+        notion_latency=args.notion_latency,
+        openai_latency=args.openai_latency,
+        existing=args.existing,
+    ).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+            feeds_file = os.path.join(tmp, "feeds.json")
+            with open(feeds_file, "w", encoding="utf-8") as f:
+                json.dump(services.feed_urls, f)
+            stats_path = os.path.join(tmp, "run_report.json")
+            env = {
+                **os.environ,
+                "NOTION_TOKEN": "bench",
+                "NOTION_DATABASE_ID": "00000000-0000-4000-8000-000000000000",
+                "OPENAI_API_KEY": "bench",
+                "NOTION_BASE_URL": services.notion_base_url,
+                "OPENAI_BASE_URL": services.openai_base_url,
+                "NOTION_RPS": str(args.notion_rps),
+                "FEEDS_FILE": feeds_file,
+                "INGEST_STATE_DB": os.path.join(tmp, "state.sqlite3"),
+                # Every size starts cold: no article page comes from an earlier run.
+                "HTTP_CACHE_PATH": os.path.join(tmp, "http_cache.sqlite3"),
+                "RUN_REPORT_PATH": stats_path,
+                # Keep a developer's .env (TEST_MODE, real keys) out of the benchmark.
+                "DOTENV_PATH": os.path.join(tmp, ".env"),
+                "TEST_MODE": "",
+                "SUMMARY_MODE": "sync",
+            }
+            log_path = os.path.join(args.log_dir or tmp, f"bench-{size}.log")
+            started = time.monotonic()
+            with open(log_path, "w", encoding="utf-8") as log:
+                proc = subprocess.Popen(
+                    [sys.executable, "-m", "knowledge_ingest", "run"],
+                    cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                )
+                # wait4 gives the resource usage of this child alone.
+                _, status, rusage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+            wall = time.monotonic() - started
+            if proc.returncode != 0:
+                with open(log_path, "r", encoding="utf-8") as log:
+                    tail = log.read()[-2000:]
+                raise RuntimeError(f"The run exited with {proc.returncode} for {size} entries:\n{tail}")
+            with open(stats_path, "r", encoding="utf-8") as f:
+                run = json.load(f)
+    finally:
+        services.stop()
+
+    return {
+        "size": size,
+        "wall": wall,
+        "entries_per_s": run["entries"] / wall if wall else 0.0,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": rusage.ru_maxrss / 1024,
+        "run": run,
+        "services": dict(services.stats, pages=services.page_count),
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    header = f"{'entries':>8}{'wall s':>9}{'entries/s':>11}{'RSS MB':>9}{'added':>8}{'429s':>6}"
+    for stage in STAGES:
+        header += f"{stage + ' p50/p95 ms':>24}"
+    print(header)
+    for r in results:
+        run = r["run"]
+        line = (
+            f"{r['size']:>8}{r['wall']:>9.1f}{r['entries_per_s']:>11.2f}{r['peak_rss_mb']:>9.1f}"
+            f"{run['added']:>8}{r['services'].get('notion_429', 0):>6}"
+        )
+        for stage in STAGES:
+            s = run["stages"].get(stage)
+            cell = f"{s['p50'] * 1000:.1f}/{s['p95'] * 1000:.1f}" if s else "-"
+            line += f"{cell:>24}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--entries-per-feed", type=int, default=50)
+    parser.add_argument("--notion-rps", type=float, default=3.0, help="Notion stub limit (and client pacing)")
+    parser.add_argument("--notion-latency", type=float, default=0.25, help="seconds per Notion request")
+    parser.add_argument("--openai-latency", type=float, default=1.5, help="seconds per chat completion")
+    parser.add_argument("--existing", type=float, default=0.1, help="fraction of entries already in Notion")
+    parser.add_argument("--log-dir", help="keep the run log of each workload here")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        writes = size * (1 - args.existing)
+        print(f"Running {size} entries (at least {writes / args.notion_rps / 60:.1f} min at {args.notion_rps:g} Notion req/s)...", flush=True)
+        results.append(run_workload(size, args))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
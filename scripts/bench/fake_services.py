@@ -0,0 +1,302 @@
+"""Local stand-ins for the RSS feeds, the Notion API and the OpenAI API.
+
+Used by bench_pipeline.py. Each service runs its own ThreadingHTTPServer on
+127.0.0.1 and only implements the endpoints the pipeline calls.
+
+- Feeds: `entries` synthetic articles split into RSS 2.0 / Atom feeds of
+  `entries_per_feed`. Every fifth entry has no body in the feed, so the
+  article page is fetched instead.
+- Notion: databases.retrieve / databases.query / pages.create. It adds
+  `notion_latency` per request and answers 429 with Retry-After once
+  requests exceed `notion_rps` (the documented average limit is 3 req/s).
+  `existing` is the fraction of the entries that are already pages.
+- OpenAI: chat.completions.create, with `openai_latency` per request.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+BASE_TIME = 1_767_225_600  # 2026-01-01T00:00:00Z
+_WORDS = None
+
+
+def _vocabulary() -> list[str]:
+    global _WORDS
+    if _WORDS is None:
+        rng = random.Random(0)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        kana = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+        words = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(3000)]
+        words += ["".join(rng.choice(kana) for _ in range(rng.randint(2, 5))) for _ in range(1000)]
+        _WORDS = words
+    return _WORDS
+
+
+def article_html(index: int, paragraphs: int = 12) -> str:
+    # Deterministic, distinct text per entry so the dedup checks do not drop it.
+    rng = random.Random(index)
+    words = _vocabulary()
+    body = "".join(
+        "<p>" + " ".join(rng.choice(words) for _ in range(rng.randint(40, 80))) + ".</p>"
+        for _ in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>Article {index}</title><script>var x = {index};</script></head>"
+        f"<body><nav><a href='/'>Home</a></nav><article><h1>Article {index}</h1>{body}</article>"
+        "<footer>Share Follow</footer></body></html>"
+    )
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    services: "FakeServices" = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status: int, body, content_type: str = "application/json", headers: dict | None = None):
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+
+class _FeedHandler(_Handler):
+    def do_GET(self):
+        s = self.services
+        path = urlsplit(self.path).path
+        s.count("feed_requests")
+        if path.startswith("/feeds/"):
+            index = int(path.rsplit("/", 1)[1].split(".")[0])
+            if index >= s.feed_count:
+                return self.send(404, {})
+            body, content_type = s.feed_xml(index)
+            return self.send(200, body, content_type)
+        if path.startswith("/articles/"):
+            return self.send(200, article_html(int(path.rsplit("/", 1)[1])).encode("utf-8"), "text/html; charset=utf-8")
+        self.send(404, {})
+
+
+class _NotionHandler(_Handler):
+    def _admit(self) -> bool:
+        s = self.services
+        s.count("notion_requests")
+        time.sleep(s.notion_latency * random.uniform(0.5, 1.5))
+        if s.notion_bucket.take():
+            return True
+        s.count("notion_429")
+        self.send(429, {"object": "error", "status": 429, "code": "rate_limited", "message": "Rate limited"},
+                  headers={"Retry-After": "1"})
+        return False
+
+    def do_GET(self):
+        if not self._admit():
+            return
+        if urlsplit(self.path).path.startswith("/v1/databases/"):
+            return self.send(200, {"object": "database", "properties": {
+                "URL": {"id": "url", "type": "url"}, "Fingerprint": {"id": "fp", "type": "rich_text"},
+            }})
+        self.send(404, {})
+
+    def do_POST(self):
+        body = self.read_json()
+        if not self._admit():
+            return
+        s = self.services
+        path = urlsplit(self.path).path
+        if path == "/v1/pages":
+            page = s.add_page(body["properties"]["URL"]["url"], body["properties"].get("Fingerprint"))
+            return self.send(200, page)
+        if path.endswith("/query"):
+            return self.send(200, s.query(body))
+        self.send(404, {})
+
+
+class _OpenAIHandler(_Handler):
+    def do_POST(self):
+        body = self.read_json()
+        s = self.services
+        s.count("openai_requests")
+        if not urlsplit(self.path).path.endswith("/chat/completions"):
+            return self.send(404, {})
+        time.sleep(s.openai_latency * random.uniform(0.5, 1.5))
+        prompt = body["messages"][-1]["content"]
+        content = "・" + "\n・".join(line.strip() for line in prompt.splitlines() if line.strip())[:300]
+        self.send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 3, "completion_tokens": 120, "total_tokens": len(prompt) // 3 + 120},
+        })
+
+
+class FakeServices:
+    def __init__(
+        self,
+        entries: int,
+        entries_per_feed: int = 50,
+        notion_rps: float = 3.0,
+        notion_latency: float = 0.25,
+        openai_latency: float = 1.5,
+        existing: float = 0.0,
+    ):
+        self.entries = entries
+        self.entries_per_feed = max(1, entries_per_feed)
+        self.feed_count = -(-entries // self.entries_per_feed)
+        self.notion_latency = notion_latency
+        self.openai_latency = openai_latency
+        self.notion_bucket = _TokenBucket(notion_rps)
+        self.stats: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._pages: list[dict] = []
+        self._servers: list[ThreadingHTTPServer] = []
+        self.feed_base_url = self.notion_base_url = self.openai_base_url = ""
+        self._existing = int(entries * existing)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _serve(self, handler) -> str:
+        cls = type(handler.__name__, (handler,), {"services": self})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), cls)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    def start(self) -> "FakeServices":
+        self.feed_base_url = self._serve(_FeedHandler)
+        self.notion_base_url = self._serve(_NotionHandler)
+        self.openai_base_url = self._serve(_OpenAIHandler) + "/v1"
+        # Spread the pre-existing pages over the workload.
+        if self._existing:
+            step = self.entries / self._existing
+            for i in range(self._existing):
+                self.add_page(self.article_url(int(i * step)))
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    @property
+    def feed_urls(self) -> list[str]:
+        return [f"{self.feed_base_url}/feeds/{i}.xml" for i in range(self.feed_count)]
+
+    def article_url(self, index: int) -> str:
+        return f"{self.feed_base_url}/articles/{index}?utm_source=rss"
+
+    def feed_xml(self, index: int) -> tuple[bytes, str]:
+        first = index * self.entries_per_feed
+        items = []
+        atom = index % 2 == 1
+        for n in range(first, min(first + self.entries_per_feed, self.entries)):
+            published = BASE_TIME - n * 60
+            url = self.article_url(n).replace("&", "&amp;")
+            body = "" if n % 5 == 0 else article_html(n).replace("]]>", "]]]]><![CDATA[>")
+            if atom:
+                stamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(published))
+                content = f"<content type=\"html\"><![CDATA[{body}]]></content>" if body else ""
+                items.append(
+                    f"<entry><title>Article {n}</title><link href=\"{url}\"/><id>urn:bench:{n}</id>"
+                    f"<published>{stamp}</published><updated>{stamp}</updated>{content}</entry>"
+                )
+            else:
+                content = f"<content:encoded><![CDATA[{body}]]></content:encoded>" if body else ""
+                items.append(
+                    f"<item><title>Article {n}</title><link>{url}</link><guid>urn:bench:{n}</guid>"
+                    f"<pubDate>{formatdate(published, usegmt=True)}</pubDate>{content}</item>"
+                )
+        if atom:
+            xml = (
+                "<?xml version=\"1.0\" encoding=\"utf-8\"?><feed xmlns=\"http://www.w3.org/2005/Atom\">"
+                f"<title>Bench feed {index}</title><id>urn:bench:feed:{index}</id>{''.join(items)}</feed>"
+            )
+            return xml.encode("utf-8"), "application/atom+xml"
+        xml = (
+            "<?xml version=\"1.0\" encoding=\"utf-8\"?>"
+            "<rss version=\"2.0\" xmlns:content=\"http://purl.org/rss/1.0/modules/content/\"><channel>"
+            f"<title>Bench feed {index}</title><link>{self.feed_base_url}</link>{''.join(items)}</channel></rss>"
+        )
+        return xml.encode("utf-8"), "application/rss+xml"
+
+    def add_page(self, url: str, fingerprint: dict | None = None) -> dict:
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "last_edited_time": time.strftime("%Y-%m-%dT%H:%M:00.000Z", time.gmtime()),
+            "properties": {"URL": {"id": "url", "type": "url", "url": url}},
+        }
+        if fingerprint:
+            text = "".join(part["text"]["content"] for part in fingerprint["rich_text"])
+            page["properties"]["Fingerprint"] = {
+                "id": "fp", "type": "rich_text", "rich_text": [{"type": "text", "plain_text": text}],
+            }
+        with self._lock:
+            self._pages.append(page)
+        return page
+
+    def query(self, body: dict) -> dict:
+        with self._lock:
+            pages = list(self._pages)
+        flt = body.get("filter") or {}
+        if "url" in flt:
+            pages = [p for p in pages if p["properties"]["URL"]["url"] == flt["url"]["equals"]]
+        if "rich_text" in flt:
+            prefix = flt["rich_text"]["starts_with"]
+            pages = [
+                p for p in pages
+                if any(t["plain_text"].startswith(prefix) for t in p["properties"].get("Fingerprint", {}).get("rich_text", []))
+            ]
+        if "last_edited_time" in flt:
+            since = flt["last_edited_time"]["on_or_after"]
+            pages = [p for p in pages if p["last_edited_time"] >= since]
+        start = int(body.get("start_cursor") or 0)
+        size = min(100, int(body.get("page_size") or 100))
+        more = start + size < len(pages)
+        return {
+            "object": "list",
+            "results": pages[start:start + size],
+            "has_more": more,
+            "next_cursor": str(start + size) if more else None,
+        }
+
+    @property
+    def page_count(self) -> int:
+        with self._lock:
+            return len(self._pages)
@@ -1,21 +1,11 @@
 import os
+import sys
 import requests
 import json
 import uuid
 
-def load_dotenv(path: str) -> None:
-    if not os.path.exists(path):
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            key, value = line.split("=", 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            if key:
-                os.environ[key] = value
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from knowledge_ingest.config import load_dotenv  # noqa: E402
 
 load_dotenv(".env")
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")